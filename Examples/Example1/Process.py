@@ -39,7 +39,7 @@ def processField(I, L, spg, n):
 
     # Saving
     print("\n[FIELD SAVING]")
-    save("Saves/Field.txt", rendering)
+    save("Saves/Field.bin", rendering)
     print("(i) Done!")
 
     #========= TRAJECTORY ================================================#
@@ -85,7 +85,7 @@ def processTrajectory(T, dt, f, I, s, w):
 
     # Saving
     print("\n[TRAJECTORY SAVING]")
-    save("Saves/Trajectory.txt", rendering)
+    save("Saves/Trajectory.bin", rendering)
     print("(i) Done!")
 
     #========= LAUNCHER ==================================================#
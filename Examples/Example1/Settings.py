@@ -37,7 +37,7 @@ electron.q = -e
 
     #========= MAGNETIC FIELD ============================================#
 
-B = magneticField(coil)
+B = CachedField(coil)
 
     #========= ELECTRIC FIELD ============================================#
 
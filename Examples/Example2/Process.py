@@ -14,24 +14,25 @@ def processTrajectories(T, dt, s1, s2):
    
     # Field
     field = Field(Volume(0, mul(3, au), mul(2, au)), div(au, 10))
+    gSampled = treeGravitationalField([star1, star2]) # field of the samples
 
     # Trajectories
     trajectory1 = Trajectory(star1)
     trajectory2 = Trajectory(star2)
-    trajectory1.F = netForce
-    trajectory2.F = netForce
     trajectory1.iniSpe = s1
     trajectory2.iniSpe = s2
     trajectory1.iniAngVel = vec(0, 0, Quantity(math.pi/(24*60*60), "s-1"))
     trajectory2.iniAngVel = vec(0, 0, Quantity(math.pi/(12*60*60), "s-1"))
+    system = System([trajectory1, trajectory2], G=G)
+    recorder = Recorder("Saves/Trajectories.bin") # written during the run
+    system.recorder = recorder
 
     # Sequence
     def sequence():
-        trajectory1.calculate(dt)
-        trajectory2.calculate(dt)
-        trajectory1.save()
-        trajectory2.save()
-        field.sample(g)
+        system.calculate(dt)
+        system.save()
+        system.flush() # the field is sampled with the new positions
+        field.sample(gSampled, True)
         
     # Calculation
     print("\n[TRAJECTORIES CALCULATION]")
@@ -58,7 +59,7 @@ def processTrajectories(T, dt, s1, s2):
 
     # Saving
     print("\n[TRAJECTORIES SAVING]")
-    save("Saves/Trajectories.txt", rendering)
+    recorder.close(rendering)
     print("(i) Done!")
 
     #========= LAUNCHER ==================================================#
@@ -23,15 +23,6 @@ star1.m = M
 star2 = Solid(Configuration(vec(0, au, 0), Basis(identity(3))), Volume(R))
 star2.m = M
 
-    #========= GRAVITATIONAL FIELD =======================================#
-
-g = add(gravitationalField(star2), gravitationalField(star1))
-
-    #========= NET FORCE =================================================#
-
-def netForce(t, solid, speed, angularVelocity):
-    return gravitationalForce(solid, g)
-
     #========= INFORMATIONS ==============================================#
 
 if __name__ == "__main__":
@@ -15,15 +15,14 @@ def processTrajectories(T, dt, n):
     # Trajectories
     trajectories = [Trajectory(stars[i]) for i in range(n)]
     for i in range(n):
-        trajectories[i].F = netForce
         trajectories[i].iniSpe = randomSpeed(stars[i].cfg.position)
+    system = System(trajectories, [blackHole], G)
+    system.integrator = "block" # individual steps of the stars
 
     # Sequence
     def sequence():
-        for i in range(n):
-            trajectories[i].calculate(dt)
-        for i in range(n):
-            trajectories[i].save()
+        system.calculate(dt)
+        system.save()
         
     # Calculation
     print("\n[TRAJECTORIES CALCULATION]")
@@ -33,6 +32,7 @@ def processTrajectories(T, dt, n):
         timer.before()
         sequence()
         timer.after()
+    system.flush()
     print("(i) Done!")
 
     # Rendering
@@ -51,7 +51,7 @@ def processTrajectories(T, dt, n):
 
     # Saving
     print("\n[TRAJECTORIES SAVING]")
-    save("Saves/Trajectories.txt", rendering)
+    save("Saves/Trajectories.bin", rendering)
     print("(i) Done!")
 
     #========= LAUNCHER ==================================================#
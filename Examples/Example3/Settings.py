@@ -50,19 +50,6 @@ stars = [Solid(randomConfiguration(), Volume(R)) for i in range(n)]
 for i in range(n):
     stars[i].m = M
 
-    #========= GRAVITATIONAL FIELD =======================================#
-
-g = add([gravitationalField(stars[i]) for i in range(n)])
-g = add(g, gravitationalField(blackHole))
-
-    #========= NET FORCE =================================================#
-
-def netForce(t, solid, speed, angularVelocity):
-    Ep = mul(norm(solid.cfg.position), norm(gravitationalForce(solid, g)))
-    Ec = mul(1/2, solid.m, pwr(2)(norm(speed)))
-    # print(add(Ec, Ep))
-    return gravitationalForce(solid, g)
-
     #========= INFORMATIONS ==============================================#
 
 if __name__ == "__main__":
@@ -36,7 +36,7 @@ def processField(B, vol, spg, fileName="FieldCut"):
     print("(i) Done!")
 
     print("\n[FIELD SAVING]")
-    save("Saves/Simulations/"+fileName+".txt", rendering)
+    save("Saves/Simulations/"+fileName+".bin", rendering)
     print("(i) Done!")
     
     #========= TRAJECTORY ================================================#
@@ -84,7 +84,7 @@ def processTrajectory(B, T, f, I, fileName="Trajectory"):
     print("(i) Done!")
 
     print("\n[TRAJECTORY SAVING]")
-    save("Saves/Simulations/"+fileName+".txt", rendering)
+    save("Saves/Simulations/"+fileName+".bin", rendering)
     print("(i) Done!")
 
     #========= LAUNCHER ==================================================#
@@ -45,8 +45,7 @@ def multipoleGeometry(n, length, radius):
 
     #========= MIRROR COILS ==============================================#
 
-n_sub = 72 # number of subdivisions
-shape1 = regularPolygon(n_sub, add(R, D))
+n_sub = 72 # number of displayed subdivisions
 
 basisA = basisCreator(Vector(0, 1, 0))
 basisB = basisCreator(Vector(0, -1, 0))
@@ -54,8 +53,8 @@ basisB = basisCreator(Vector(0, -1, 0))
 positionA = vec(0, -div(L, 2), 0)
 positionB = vec(0, div(L, 2), 0)
 
-coilA = Solid(Configuration(positionA, basisA), shape1)
-coilB = Solid(Configuration(positionB, basisB), shape1)
+coilA = CircularLoop(Configuration(positionA, basisA), add(R, D), n=n_sub)
+coilB = CircularLoop(Configuration(positionB, basisB), add(R, D), n=n_sub)
 
     #========= MULTIPOLE =================================================#
 
@@ -104,9 +103,9 @@ if False: # calculation of a new field
     print("\n[FIELD CALCULATION]")
     field.sample(function)
     print("(i) Done!")
-    save("Saves/FieldForApproximation.txt", field)
+    save("Saves/FieldForApproximation.bin", field)
 
-field = eval(load("Saves/FieldForApproximation.txt"))
+field = eval(load("Saves/FieldForApproximation.bin"))
 oneAmpereB = continuousApproximation(field)
 def B2(r):
     try:
@@ -138,8 +137,7 @@ if __name__ == "__main__":
     print("(i) Radius: "+str(R))
     print("(i) Length: "+str(L))
     print("\n[MIRROR COILS]")
-    print("(i) Subivisions: "+str(n_sub))
-    print("(i) Integration length: "+str(mul(add(R, D), 2*math.pi/n_sub)))
+    print("(i) Radius: "+str(coilA.radius))
     print("\n[MULTIPOLE]")
     print("(i) Number of poles: "+str(N))
     print("(i) Subivisions: "+str(len(coilC.shp)))
@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""Tests of the differentiation with dual numbers."""
+
+import numpy
+import pytest
+from tools.fields import *
+
+r = Quantity(Vector(1., 2., 3.), "m")
+
+def test_derivatives():
+    x = Dual(numpy.array([0.3, 1.2]), numpy.ones((2, 1)))
+    for f, df in [(numpy.sin, numpy.cos), (numpy.exp, numpy.exp),
+                  (numpy.sqrt, lambda v: 0.5/numpy.sqrt(v)),
+                  (lambda v: v**3, lambda v: 3*v**2)]:
+        y = f(x)
+        assert numpy.allclose(y.der[:, 0], df(x.val))
+
+def test_unsupported_operation():
+    x = Dual(numpy.array(1.), numpy.ones(1))
+    with pytest.raises(DualError):
+        float(x)
+    with pytest.raises(DualError):
+        numpy.add.accumulate(x)
+
+def test_gradient_matches_difference():
+    def f(r):
+        return Quantity(numpy.sin(r.magnitude[0])*r.magnitude[1], "")
+    def g(r): # rejects dual numbers
+        return Quantity(math.sin(r.magnitude[0])*r.magnitude[1], "")
+    a, b = gradient(f)(r).magnitude, gradient(g, 1e-5)(r).magnitude
+    assert numpy.allclose(a.array, b.array, rtol=1e-8)
+
+def test_errors_are_not_masked():
+    def f(r):
+        raise ValueError("bug")
+    with pytest.raises(ValueError):
+        gradient(f)(r)
+
+def test_laplacian():
+    def f(r):
+        return scaPro(r, r)
+    assert abs(scaLap(f)(r).magnitude-6) < 1e-6
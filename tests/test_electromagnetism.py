@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""Tests of the magnetic fields of the coils."""
+
+import numpy
+import pytest
+import tools.electromagnetism
+from tools.electromagnetism import *
+
+rng = numpy.random.default_rng(0)
+
+def coil():
+    cfg = Configuration(Vector(0.1, 0, -0.2), basisCreator(Vector(0, 1, 1)))
+    return CircularLoop(cfg, 0.2, i=2)
+
+def positions(n, size):
+    return Quantity(VectorArray(rng.uniform(-size, size, (n, 3))), "m")
+
+def test_cached_field(monkeypatch):
+    calls = [] # evaluations of the unit fields
+    def counted(solid):
+        unit = unitMagneticField(solid)
+        def aux(r):
+            calls.append(len(r))
+            return unit(r)
+        return aux
+    monkeypatch.setattr(tools.electromagnetism, "unitMagneticField", counted)
+    loop = coil()
+    B, r = CachedField(loop), positions(50, 0.5)
+    def check(evaluations):
+        B0 = mul(loop.i, unitMagneticField(loop)(r)).magnitude.array
+        assert numpy.array_equal(B(r).magnitude.array, B0)
+        assert len(calls) == evaluations
+    check(1)
+    check(1) # cached
+    loop.i = Quantity(-3, "A")
+    check(1) # the current only scales the cached unit field
+    loop.radius = 0.3
+    check(2)
+    loop.cfg.position = Quantity(Vector(0, 0.1, 0), "m")
+    check(3)
+    loop.cfg.basis = basisCreator(Vector(1, 0, 1))
+    check(4)
+    B(positions(10, 0.5))
+    check(5) # a new batch of positions
+    B.clear()
+    check(6)
+
+def test_circular_loop():
+    loop = coil()
+    x = rng.uniform(-0.5, 0.5, (400, 3))
+    d = numpy.hypot(numpy.hypot(x[:, 0], x[:, 1])-0.2, x[:, 2])
+    x = numpy.concatenate([x[d > 0.05], [[0, 0, 0], [0.3, 0, 0]]])
+    r = loop.cfg.outside(Quantity(VectorArray(x), "m"))
+    polygon = Solid(loop.cfg, regularPolygon(20000, 0.2), i=loop.i)
+    B = magneticField(loop)(r).magnitude.array
+    B0 = magneticField(polygon)(r).magnitude.array
+    scale = numpy.linalg.norm(B0, axis=1)
+    assert (numpy.linalg.norm(B-B0, axis=1) < 1e-7*scale).all()
+
+def test_circular_loop_axis():
+    loop, z = coil(), numpy.linspace(-1, 1, 21)
+    x = numpy.stack([0*z, 0*z, z], axis=-1)
+    B = loop.cfg.basis.inside(magneticField(loop)(
+        loop.cfg.outside(Quantity(VectorArray(x), "m"))))
+    B0 = mu_0.magnitude*2*0.2**2/(2*(0.2**2+z*z)**1.5)
+    assert numpy.allclose(rawArray(B.magnitude), B0[:, None]*[0, 0, 1],
+                          rtol=1e-12, atol=1e-12*B0.max())
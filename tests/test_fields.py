@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""Tests of the sampled fields and of the fields of point sources."""
+
+import numpy
+import pytest
+from tools.electromagnetism import *
+from tools.gravitation import *
+
+cfg = Configuration(Vector(0.1, -0.2, 0.3), basisCreator(Vector(1, 2, 3)))
+rng = numpy.random.default_rng(0)
+
+def linear(r):
+    x = rawArray(cfg.inside(r).magnitude)
+    return Quantity(fromArray(x @ [[1., 2, 0], [0, -1, 3], [4, 0, 1]], 1), "T")
+
+def smooth(r):
+    x = rawArray(cfg.inside(r).magnitude)
+    return Quantity(fromArray(numpy.sin(3*x), 1), "T")
+
+def positions(n, size):
+    x = rng.uniform(-size, size, (n, 3))
+    return cfg.outside(Quantity(VectorArray(x), "m"))
+
+def pointwise(r): # one position at a time
+    x = rawArray(cfg.inside(r).magnitude)
+    return Quantity(Vector(*numpy.sin(3*x)), "T")
+
+def scalar(r): # rejects the batches
+    return Quantity(float(numpy.sin(3*r.magnitude[0])*r.magnitude[1]), "V")
+
+def sampled(f, vol=Volume(0.2, 0.3, 0.4), vectorized=None):
+    field = Field(vol, 0.05, cfg)
+    field.sample(f, vectorized)
+    return field.grid()
+
+@pytest.mark.parametrize("vol", [Volume(0.2, 0.3, 0.4), Volume(0.2, 0.3),
+                                 Volume(0.2)])
+def test_vectorized_sampling(vol):
+    a = sampled(smooth, vol, True)
+    assert a.shape[:4] == (1,)+tuple(Field(vol, 0.05, cfg).n[:3])
+    assert numpy.allclose(a, sampled(pointwise, vol, False), rtol=1e-14)
+    assert numpy.allclose(sampled(scalar, vol), sampled(scalar, vol, False))
+    with pytest.raises(Exception):
+        sampled(scalar, vol, True)
+
+@pytest.mark.parametrize("workers, size", [(1, None), (2, None), (3, 7)])
+def test_sampler(workers, size):
+    field = Field(Volume(0.2, 0.15, 0.1), 0.05, cfg)
+    Sampler(workers, size).sample(field, [smooth, linear])
+    assert field.n[3] == 2
+    a = field.grid()
+    assert numpy.array_equal(a[0], sampled(smooth, field.vol)[0])
+    assert numpy.array_equal(a[1], sampled(linear, field.vol)[0])
+
+def quadratic(r):
+    x, y, z = rawArray(r.magnitude).T
+    return Quantity(fromArray(numpy.stack([x*y, z*z-x, x*z+3*y*y], -1), 1),
+                    "T")
+
+def cubic(r):
+    x, y, z = rawArray(r.magnitude).T
+    return Quantity(fromArray(numpy.stack([x**3+y*z*z, x*y*z, y**3], -1), 1),
+                    "T")
+
+def test_grid_derivatives():
+    field = Field(Volume(0.2, 0.3, 0.4), 0.05, cfg)
+    field.sample(quadratic)
+    x, y, z = rawArray(field.positions().magnitude).T
+    J0 = numpy.array([[y, x, 0*x], [-1+0*x, 0*x, 2*z], [z, 6*y, x]])
+    J, unit = gridJacobian(field, 1)
+    assert unit == Unit("T.m-1")
+    J0 = numpy.moveaxis(J0, -1, 0).reshape(J.shape)
+    assert numpy.allclose(J[:, 1:-1, 1:-1, 1:-1], J0[:, 1:-1, 1:-1, 1:-1],
+                          atol=1e-12)
+    for k in (0, -1): # samples on the faces of the grid
+        assert numpy.allclose(J[:, k], J0[:, k], atol=1e-12)
+        assert numpy.allclose(J[:, :, k], J0[:, :, k], atol=1e-12)
+        assert numpy.allclose(J[:, :, :, k], J0[:, :, :, k], atol=1e-12)
+    c = curl(field).grid().reshape(-1, 3)
+    assert numpy.allclose(c, numpy.stack([6*y-2*z, -z, -1-x], -1), atol=1e-12)
+    field = Field(Volume(0.2, 0.3, 0.4), 0.05, cfg)
+    field.sample(cubic)
+    lap = vecLap(field)
+    assert lap.stg.unit == Unit("T.m-2")
+    a = lap.grid().reshape(-1, 3)
+    assert numpy.allclose(a, numpy.stack([6*x+2*y, 0*x, 6*y], -1), atol=1e-9)
+
+def errors(f, mode):
+    field = Field(Volume(0.4, 0.5, 0.6), 0.05, cfg)
+    field.sample(f, True)
+    r = positions(200, 0.14) # away from the extrapolated faces
+    values = Interpolator(field, mode=mode)(r).magnitude.array
+    return numpy.abs(values-f(r).magnitude.array).max()
+
+def test_interpolator_linear():
+    for mode in Interpolator.modes:
+        assert errors(linear, mode) < 1e-12
+
+def test_interpolator_accuracy():
+    linearError, cubicError = errors(smooth, "linear"), errors(smooth, "cubic")
+    assert linearError < 1e-2 and cubicError < linearError/5
+
+def test_interpolator_outside():
+    field = Field(Volume(0.4, 0.5, 0.6), 0.05, cfg)
+    field.sample(linear, True)
+    with pytest.raises(ValueError):
+        Interpolator(field)(cfg.outside(Quantity(Vector(0.3, 0, 0), "m")))
+
+def points(n):
+    solids = []
+    for i in range(n):
+        p = Quantity(Vector(*rng.normal(size=3)), "m")
+        solids.append(Solid(Configuration(p, Basis(identity(3))),
+                            Volume(Quantity(1e-3, "m")),
+                            Quantity(rng.uniform(1, 2), "kg"),
+                            Quantity(rng.uniform(-1, 1), "C")))
+    return solids
+
+def direct(solids, r, attribute):
+    """Return the sums of s/d^3*d over the solids at the distances d."""
+    p = numpy.array([s.cfg.position.magnitude.array for s in solids])
+    s = numpy.array([getattr(a, attribute).magnitude for a in solids])
+    d = rawArray(r.magnitude)[:, None]-p[None]
+    return (s[:, None]*d/numpy.linalg.norm(d, axis=2)[..., None]**3).sum(1)
+
+def relativeErrors(f, f0):
+    return numpy.linalg.norm(f-f0, axis=1)/numpy.linalg.norm(f0, axis=1)
+
+@pytest.mark.parametrize("theta, tol", [(0, 1e-10), (0.5, 1e-2)])
+def test_tree_gravitational_field(theta, tol):
+    solids, r = points(500), positions(2000, 2)
+    g0 = -G.magnitude*direct(solids, r, "m")
+    g = treeGravitationalField(solids, theta)(r).magnitude.array
+    assert numpy.median(relativeErrors(g, g0)) < tol
+
+@pytest.mark.parametrize("theta, tol", [(0, 1e-10), (0.5, 2e-2)])
+def test_tree_electric_field(theta, tol):
+    solids, r = points(500), positions(2000, 2)
+    E0 = direct(solids, r, "q")/(4*math.pi*epsilon_0.magnitude)
+    E = treeElectricField(solids, theta)(r).magnitude.array
+    assert numpy.median(relativeErrors(E, E0)) < tol
+
+@pytest.mark.parametrize("eps", [0, 0.1])
+def test_gravitational_field_batch(eps):
+    solid = points(1)[0]
+    p = rawArray(solid.cfg.position.magnitude)
+    x = numpy.concatenate([rawArray(positions(20, 2).magnitude), [p]])
+    r = Quantity(VectorArray(x), "m")
+    g = gravitationalField(solid, eps)
+    values = g(r)
+    assert values.unit == Unit("m.s-2")
+    expected = [rawArray(g(p).magnitude) for p in r]
+    assert numpy.allclose(values.magnitude.array, expected, rtol=1e-14)
+    assert not values.magnitude.array[-1].any() # at the position of the mass
+    if eps == 0:
+        g0 = -G.magnitude*direct([solid], r[:-1], "m")
+        assert numpy.allclose(values.magnitude.array[:-1], g0, rtol=1e-12)
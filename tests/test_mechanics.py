@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""Tests of the interactions and of the integrators of System."""
+
+import math
+import numpy
+import pytest
+from tools.mechanics import *
+
+def direct(p, m):
+    return pairForces(p, m, 0*m, p, m, 0*m, 1., 0.)
+
+def relativeErrors(f, f0):
+    return numpy.linalg.norm(f-f0, axis=1)/numpy.linalg.norm(f0, axis=1)
+
+def test_octree_close_pair():
+    p = numpy.array([[0, 0, 0], [1e-7, 0, 0], [1., 1., 1.]])
+    m = numpy.ones(3)
+    for theta in [0, 0.5]:
+        f = Octree(p, m).forces(p, m, 1., theta)
+        assert numpy.allclose(f, direct(p, m), rtol=1e-12)
+
+def test_octree_exact_for_theta_zero():
+    rng = numpy.random.default_rng(0)
+    c = rng.normal(size=(30, 3))
+    p = numpy.concatenate([c+1e-9*rng.normal(size=c.shape)
+                           for i in range(20)])
+    m = rng.uniform(1, 2, len(p))
+    f = Octree(p, m).forces(p, m, 1., 0)
+    assert relativeErrors(f, direct(p, m)).max() < 1e-10
+
+def test_octree_accuracy():
+    rng = numpy.random.default_rng(1)
+    p, m = rng.normal(size=(2000, 3)), rng.uniform(1, 2, 2000)
+    e = relativeErrors(Octree(p, m).forces(p, m, 1., 0.5), direct(p, m))
+    assert numpy.median(e) < 1e-2
+
+def test_close_pairs():
+    rng = numpy.random.default_rng(2)
+    p = rng.random((500, 3))
+    p[:5] = p[0]
+    for r in [0, 0.1, 0.3, numpy.inf]:
+        i, j = closePairs(p, r)
+        found = set(zip(i.tolist(), j.tolist()))
+        assert len(found) == len(i) and all(i < j)
+        d = numpy.linalg.norm(p[:, None]-p[None], axis=2)
+        assert set(zip(*numpy.nonzero(numpy.triu(d < r, 1)))) <= found
+
+def charged(x, q, m=1.):
+    cfg = Configuration(Quantity(Vector(x, 0, 0), "m"), Basis(identity(3)))
+    return Solid(cfg, Volume(Quantity(1e-3, "m")), Quantity(m, "kg"),
+                 Quantity(q, "C"))
+
+def test_coulomb_encounter():
+    solids = [charged(0, 1e-3), charged(1e-2, -1e-3), charged(10, 1e-3)]
+    system = System([Trajectory(a) for a in solids], k=8.99e9)
+    system.encounter = 1
+    system.initialize(Quantity(1, "s"))
+    tau = math.sqrt(1e-6/(8.99e9*1e-6*2)) # sqrt(r^3/mu)
+    assert system.encounters(1e-3) == [([0, 1], math.ceil(1e-3/tau))]
+    system.k = Quantity(0, "N.m2.C-2")
+    assert system.encounters(1e-3) == []
+
+def test_softening():
+    r2, eps = numpy.linspace(0, 16, 1601), 1.
+    plummer = softening(r2, eps)
+    assert numpy.allclose(plummer, (r2+eps*eps)**-1.5)
+    spline = softening(r2, eps, "spline")
+    outside = r2 >= 2.8**2
+    assert numpy.allclose(spline[outside], r2[outside]**-1.5)
+    assert numpy.all(numpy.isfinite(spline))
+    assert numpy.abs(numpy.diff(spline)).max() < 1e-2 # continuous
+    assert softening(numpy.zeros(2)).tolist() == [0, 0]
+    with pytest.raises(ValueError):
+        softening(r2, eps, "gaussian")
+
+def body(x, m):
+    cfg = Configuration(Quantity(Vector(x, 0, 0), "m"), Basis(identity(3)))
+    return Solid(cfg, Volume(Quantity(1e-3, "m")), Quantity(m, "kg"))
+
+def orbit(integrator, n, r=1., v=1., eta=0.02):
+    """Return the distance to the starting point after one period of the
+    orbit of semi-major axis 1 around a unit mass (G = 1) and the number
+    of evaluations of the forces."""
+    trajectory = Trajectory(body(r, 1e-12))
+    trajectory.iniSpe = Quantity(Vector(0, v, 0), "m.s-1")
+    system = System([trajectory], [body(0, 1.)], 1.)
+    system.integrator, system.eta = integrator, eta
+    for i in range(n):
+        system.calculate(Quantity(2*math.pi/n, "s"))
+        system.save()
+    return numpy.linalg.norm(system.p[0]-[r, 0, 0]), system.evaluations
+
+@pytest.mark.parametrize("integrator, n, tol", [("euler", 2000, 1e-4),
+                                                ("verlet", 200, 5e-3),
+                                                ("rk4", 100, 1e-5),
+                                                ("block", 20, 2e-3)])
+def test_circular_orbit(integrator, n, tol):
+    assert orbit(integrator, n)[0] < tol
+
+def test_block_steps():
+    v = math.sqrt(19) # eccentricity 0.9, starts at the periapsis
+    error, evaluations = orbit("block", 20, 0.1, v)
+    reference = orbit("verlet", 8000, 0.1, v)
+    assert error < reference[0]/10 and evaluations < reference[1]/4
+
+@pytest.mark.parametrize("attribute", ["F", "T"])
+def test_trajectory_forces_in_system(attribute):
+    trajectory = Trajectory(body(1., 1.))
+    setattr(trajectory, attribute, lambda time, solid, speed, av: None)
+    with pytest.raises(ValueError):
+        System([trajectory], [body(0, 1.)], 1.).calculate(Quantity(1, "s"))
+    trajectory = Trajectory(body(1., 1.))
+    system = System([trajectory], [body(0, 1.)], 1.)
+    system.calculate(Quantity(1, "s"))
+    system.save()
+    system.flush()
+    assert not rawArray(trajectory.data["t"].array).any()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""Tests of the units and of the storages."""
+
+import pickle
+import numpy
+import pytest
+from tools.quantities import *
+
+def test_interned_units():
+    a = Unit("N.m2.kg-2")
+    assert a is Unit("N.m2.kg-2") is Unit(list(a.dimension))
+    assert a is Unit(a) is pickle.loads(pickle.dumps(a))
+    assert uniMul(Unit("m"), Unit("s-1")) is Unit("m.s-1")
+    assert {a: 1}[a.dimension] == 1 and a == list(a.dimension)
+    with pytest.raises(AttributeError):
+        a.dimension = (0,)*7
+
+def test_parse_cache():
+    Unit.parse.cache_clear()
+    for i in range(3):
+        Unit("kg.m.s-2")
+    info = Unit.parse.cache_info()
+    assert info.misses == 1 and info.hits == 2
+    with pytest.raises(ValueError):
+        Unit("kg.furlong")
+
+@pytest.mark.parametrize("symbol, expected", [("kg.m.s-2", "N"),
+                                              ("kg.m2.s-3.A-1", "V"),
+                                              ("m.s-1", "m.s-1"),
+                                              ("kg.m.s-3", "N.s-1"),
+                                              ("mol.cd2", "mol.cd2")])
+def test_symbols(symbol, expected):
+    u = Unit(symbol)
+    assert str(u) == expected
+    assert "symbol" in u.__dict__ and str(u) is str(u) # computed once
+
+def test_storage_growth():
+    s = Storage("m", Vector)
+    buffers = set()
+    for i in range(100):
+        s.add(Quantity(Vector(i, 0., 0.), "m"))
+        buffers.add(id(s.buffer))
+    assert len(s) == 100 and len(buffers) <= 4 # amortized doubling
+    assert s[99].magnitude == Vector(99., 0., 0.)
+    assert numpy.array_equal(s.array[:, 0], numpy.arange(100))
+
+def test_storage_reserve():
+    s = Storage("s", Vector.scalars)
+    s.reserve((), float, 1000)
+    buffer = s.buffer
+    s.extend(Quantity(numpy.arange(1000.), "s"))
+    assert s.buffer is buffer and len(s) == 1000
+    with pytest.raises(ValueError):
+        s.reserve((3,), float, 1)
+    s.add(Quantity(1j, "s"))
+    assert s.array.dtype.kind == "c" and s[1000].magnitude == 1j
+
+def test_storage_matrices():
+    m = numpy.arange(8.).reshape(2, 2, 2)
+    s = Storage("T", Matrix)
+    s.extend(Quantity(MatrixArray(m), "T"))
+    assert s[1].magnitude == Matrix(m[1])
+    assert numpy.array_equal(eval(repr(s)).array, s.array)
+    with pytest.raises(UnitError):
+        s.add(Quantity(Matrix(m[0]), "m"))
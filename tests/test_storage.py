@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""Tests of the binary saves."""
+
+import numpy
+import pytest
+from tools.mechanics import *
+
+def storage(n, shift):
+    s = Storage("m", Vector)
+    s.extend(Quantity(VectorArray(numpy.arange(3.*n).reshape(n, 3)+shift),
+                      "m"))
+    return s
+
+def test_save_load(tmp_path):
+    s = storage(5, 0)
+    save(str(tmp_path/"a.bin"), s)
+    t = eval(load(str(tmp_path/"a.bin")))
+    assert numpy.array_equal(t.array, s.array)
+    assert t.unit is Unit("m")
+
+def test_loads_are_independent(tmp_path):
+    save(str(tmp_path/"a.bin"), storage(5, 0))
+    save(str(tmp_path/"b.bin"), storage(7, 100))
+    a = load(str(tmp_path/"a.bin"))
+    b = load(str(tmp_path/"b.bin"))
+    assert numpy.array_equal(eval(a).array, storage(5, 0).array)
+    assert numpy.array_equal(eval(b).array, storage(7, 100).array)
+
+def test_release(tmp_path):
+    path = str(tmp_path/"a.bin")
+    save(path, storage(5, 0))
+    content = load(path)
+    s = eval(content)
+    release(path)
+    assert not any(k in content for k in blocks)
+    assert numpy.array_equal(s.array, storage(5, 0).array)
+
+def test_write_during_the_run(tmp_path):
+    path = str(tmp_path/"run.bin")
+    s, recorder = storage(5, 0), Recorder(path)
+    recorder.write(s)
+    s.extend(Quantity(VectorArray(numpy.ones((2, 3))), "m"))
+    recorder.write(s)
+    s.extend(Quantity(VectorArray(numpy.zeros((1, 3))), "m"))
+    assert numpy.array_equal(loadBlocks(path)[0], s.array[:7])
+    recorder.close(s)
+    assert numpy.array_equal(eval(load(path)).array, s.array)
+
+def body(x, m):
+    cfg = Configuration(Quantity(Vector(x, 0, 0), "m"), Basis(identity(3)))
+    return Solid(cfg, Volume(Quantity(1e-3, "m")), Quantity(m, "kg"))
+
+@pytest.mark.parametrize("system", [False, True])
+def test_recorded_trajectories(tmp_path, system):
+    path = str(tmp_path/"run.bin")
+    trajectory = Trajectory(body(1, 1e-12))
+    trajectory.iniSpe = Quantity(Vector(0, 1, 0), "m.s-1")
+    run = System([trajectory], [body(0, 1)], 1) if system else trajectory
+    run.recorder, run.chunk = Recorder(path), 4
+    for i in range(10):
+        run.calculate(Quantity(0.01, "s"))
+        run.save()
+        times = loadBlocks(path).get(0, numpy.zeros(0))
+        assert len(times) == (i+1)//4*4 # written by chunks of 4 steps
+    run.flush()
+    run.recorder.close(trajectory)
+    times = eval(load(path)).data["times"].array
+    assert numpy.allclose(times, 0.01*numpy.arange(10))
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""Tests of the integrators of Trajectory."""
+
+import math
+import pytest
+import tools.mechanics
+from tools.mechanics import *
+
+def oscillator(integrator):
+    solid = Solid(Configuration(Vector(1., 0, 0), Basis(identity(3))),
+                  Volume(Quantity(1, "m")))
+    trajectory = Trajectory(solid)
+    trajectory.integrator = integrator
+    def F(time, solid, speed, angularVelocity):
+        return mul(Quantity(-1, "N.m-1"), solid.cfg.position)
+    trajectory.F = F
+    return trajectory
+
+def run(trajectory, n, dt):
+    for i in range(n):
+        trajectory.calculate(Quantity(dt, "s"))
+        trajectory.save()
+    return trajectory.solid.cfg.position.magnitude[0]
+
+@pytest.mark.parametrize("integrator, n, tol", [("euler", 2000, 1e-2),
+                                                ("verlet", 200, 1e-3),
+                                                ("rk4", 100, 1e-6),
+                                                ("rk45", 4, 1e-6)])
+def test_oscillator(integrator, n, tol):
+    x = run(oscillator(integrator), n, 2*math.pi/n)
+    assert abs(x-1) < tol
+
+def gyration(integrator):
+    """Charge in a uniform magnetic field: a circle of radius 1."""
+    trajectory = oscillator(integrator)
+    trajectory.solid.q = Quantity(1, "C")
+    trajectory.iniSpe = Quantity(Vector(0, 1., 0), "m.s-1")
+    calls = []
+    def F(time, solid, speed, angularVelocity):
+        calls.append(time)
+        return mul(solid.q, vecPro(speed, Quantity(Vector(0, 0, -1.), "T")))
+    trajectory.F = F
+    return trajectory, calls
+
+def test_verlet_reuse():
+    a, b = oscillator("verlet"), oscillator("verlet")
+    a.reuse = True
+    assert run(a, 50, 0.1) == run(b, 50, 0.1)
+
+def test_verlet_speed_dependent_forces():
+    trajectory = gyration("verlet")[0]
+    run(trajectory, 100, 2*math.pi/100)
+    p = trajectory.solid.cfg.position.magnitude
+    assert abs(math.hypot(p[0], p[1])-1) < 2.5e-4
+
+def test_rk45_first_same_as_last():
+    (a, calls), (b, counts) = gyration("rk45"), gyration("rk45")
+    for i in range(20):
+        b.cache = None
+        b.calculate(Quantity(0.3, "s"))
+        b.save()
+    assert run(a, 20, 0.3) == b.solid.cfg.position.magnitude[0]
+    assert len(calls) == len(counts)-19
+
+def test_rk45_through_origin():
+    trajectory = oscillator("rk45")
+    trajectory.solid.cfg = Configuration(Vector(0., 0, 0), Basis(identity(3)))
+    trajectory.iniSpe = Quantity(Vector(1., 0, 0), "m.s-1")
+    assert abs(run(trajectory, 8, math.pi/4)) < 1e-6
+
+def test_orientation_between_steps(monkeypatch):
+    calls = [] # conversions of rotation matrices
+    def counted(m):
+        calls.append(m)
+        return magMatQua(m)
+    monkeypatch.setattr(tools.mechanics, "magMatQua", counted)
+    trajectory = oscillator("euler")
+    trajectory.iniAngVel = Quantity(Vector(0, 0, 0.), "s-1")
+    run(trajectory, 2, 0.1)
+    basis = basisCreator(Vector(1., 0, 0))
+    trajectory.solid.cfg = Configuration(trajectory.solid.cfg.position, basis)
+    run(trajectory, 2, 0.1)
+    m = trajectory.solid.cfg.basis.matrixBtoE.array
+    assert numpy.allclose(m, basis.matrixBtoE.array)
+    assert len(calls) == 2 # the quaternions are carried between the steps
+    basis = trajectory.basis(3) # converted when its matrices are read
+    assert numpy.allclose(basis.matrixBtoE.array, m)
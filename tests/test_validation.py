@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""Tests of the validation levels of the argument checks."""
+
+import sys
+import pytest
+import tools.calculation
+from tools.calculation import *
+
+@pytest.fixture
+def first():
+    setValidation("first")
+    yield
+    setValidation("strict")
+
+def test_first_checks_each_call_site(first):
+    a = Quantity(Vector(1, 2, 3), "m")
+    for i in range(3):
+        assert add(a, a).magnitude == Vector(2, 4, 6)
+    with pytest.raises(TypeError):
+        add(a, Quantity(Vector(5), "m"))
+
+def test_first_keeps_units(first):
+    a = Quantity(Vector(1, 2, 3), "m")
+    for i in range(3):
+        assert mul(a, Quantity(2, "s")).unit == Unit("m.s")
+
+class Frames:
+    """Counts the lookups of the call sites."""
+    def __init__(self):
+        self.lookups = 0
+    def _getframe(self, depth):
+        self.lookups += 1
+        return sys._getframe(depth+1)
+
+@pytest.mark.parametrize("level, lookups", [("strict", 0), ("first", 10),
+                                            ("off", 0)])
+def test_call_site_lookups(monkeypatch, level, lookups):
+    frames = Frames()
+    monkeypatch.setattr(tools.calculation, "sys", frames)
+    a = Quantity(Vector(1, 2, 3), "m")
+    setValidation(level)
+    try:
+        for i in range(10):
+            assert add(a, a).unit is Unit("m")
+    finally:
+        setValidation("strict")
+    assert frames.lookups == lookups
+
+def test_first_rechecks_new_signatures(first):
+    for u in ["m", "s", "m"]:
+        a = Quantity(Vector(1, 2, 3), u)
+        assert add(a, a).unit is Unit(u)
+    with pytest.raises(UnitError):
+        for b in [Quantity(1, "m"), Quantity(1, "s")]:
+            add(Quantity(1, "m"), b)
+
+def test_unit_hash():
+    assert hash(Unit("m")) == hash(Unit("m").dimension)
+    assert {Unit("m"): 1}[Unit("m").dimension] == 1
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""Tests of the linear algebra of the vector spaces."""
+
+import math
+import numpy
+import pytest
+from tools.vectorspace import *
+
+rng = numpy.random.default_rng(0)
+
+def test_batches():
+    a, b = rng.normal(size=(5, 3)), rng.normal(size=(5, 3))
+    m, v = rng.normal(size=(5, 3, 3)), Vector(1., 2., 3.)
+    A, B, M = VectorArray(a), VectorArray(b), MatrixArray(m)
+    assert numpy.allclose(magAdd(A, v).array, a+v.array)
+    assert numpy.allclose(magSub(A, B).array, a-b)
+    assert numpy.allclose(magScaPro(A, B), (a*b).sum(axis=1))
+    assert numpy.allclose(magVecPro(A, v).array, numpy.cross(a, v.array))
+    assert numpy.allclose(magNorm(2)(A), numpy.linalg.norm(a, axis=1))
+    assert numpy.allclose(auxMul(M, A).array, (m @ a[..., None])[..., 0])
+    assert numpy.allclose(magRotMat(A)[2].array, magRotMat(A[2]).array)
+    assert A[1:3] == VectorArray(a[1:3]) and M[4] == Matrix(m[4])
+    assert [u.array.tolist() for u in A] == a.tolist()
+
+def taylor(m, terms=80):
+    f, x = numpy.identity(len(m)), numpy.identity(len(m))
+    for k in range(1, terms):
+        x = x @ m/k
+        f = f+x
+    return f
+
+def test_lu():
+    a = rng.normal(size=(6, 6))
+    a[0, 0] = 0 # pivoting
+    b = rng.normal(size=6)
+    lu = LU(Matrix(a))
+    assert numpy.isclose(lu.det(), numpy.linalg.det(a))
+    assert numpy.allclose(lu.solve(Vector(b)).array, numpy.linalg.solve(a, b))
+    assert numpy.allclose(lu.inverse().array, numpy.linalg.inv(a))
+    assert LU(Matrix(numpy.ones((3, 3)))).singular()
+
+def test_lu_singular():
+    m = Matrix(Vector(1, 2, 3), Vector(4, 5, 6), Vector(7, 8, 9))
+    assert LU(m).singular() and magDet(m) == 0
+    with pytest.raises(ValueError, match="determinant of the matrix is zero"):
+        magInv(m)
+    with pytest.raises(ValueError):
+        magSolve(m, Vector(1, 0, 0))
+    small = Matrix(1e-150*numpy.identity(3))
+    assert numpy.allclose(magInv(small).array, 1e150*numpy.identity(3))
+
+def test_lu_complex():
+    a = rng.normal(size=(4, 4))+1j*rng.normal(size=(4, 4))
+    b = rng.normal(size=(4, 4))
+    x = LU(Matrix(a)).solve(Matrix(b)).array
+    assert numpy.allclose(x, numpy.linalg.solve(a, b))
+
+@pytest.mark.parametrize("scale", [1e-3, 1, 10])
+def test_exponential(scale):
+    a = scale*rng.normal(size=(4, 4))
+    s = a+a.T
+    w, v = numpy.linalg.eigh(s)
+    f = magExp(Matrix(s)).array
+    assert numpy.allclose(f/numpy.exp(w).max(), (v*numpy.exp(w)) @ v.T
+                          /numpy.exp(w).max(), rtol=0, atol=1e-12)
+    if scale <= 1:
+        f = magExp(Matrix(a)).array
+        assert numpy.allclose(f, taylor(a), rtol=1e-12, atol=1e-14)
+        assert numpy.allclose(f @ magExp(Matrix(-a)).array, numpy.identity(4))
+
+def test_exponential_rotation():
+    w = rng.normal(size=3)
+    a = numpy.array([[0, -w[2], w[1]], [w[2], 0, -w[0]], [-w[1], w[0], 0]])
+    f = magExp(Matrix(a)).array
+    assert numpy.allclose(f, taylor(a))
+    assert numpy.allclose(f @ f.T, numpy.identity(3))
+    assert math.isclose(magExp(2.), math.exp(2))
+
+@pytest.mark.parametrize("p", [0, 1, 5, -3, numpy.int64(4)])
+def test_power(p):
+    a = rng.normal(size=(3, 3))
+    ap = numpy.linalg.matrix_power(a, int(p))
+    assert numpy.allclose(magPwr(p)(Matrix(a)).array, ap)
+
+def test_fractional_power():
+    assert magPwr(0.5)(4.) == 2
+    with pytest.raises(TypeError):
+        magPwr(0.5)(Matrix(numpy.identity(2)))
@@ -9,29 +9,176 @@ __version__ = "1.0.0"
     #========= IMPORTS ===================================================#
 
 import os
+import json
+import uuid
+import struct
+import numpy
 
     #========= STORAGE ===================================================#
 
+magic = b"TOOLSBIN" # signature of the binary files
+blocks = {}         # arrays of the binary files loaded, by file identifier
+
 def save(path, data):
-    """Save the data to a file."""
-    file = open(path, "w")
-    file.write(__version__+"\n"+repr(data))
-    file.close()
+    """Save the data to a binary file."""
+    Recorder(path).close(data)
     
 def load(path):
-    """Load the data from a file and return a string."""
-    file = open(path, "r")
-    version, content = file.read().splitlines()
+    """Load the data from a file and return a string referring to 'blocks'."""
+    file = open(path, "rb")
+    if file.read(len(magic)) != magic:
+        file.close()
+        file = open(path, "r")
+        version, content = file.read().splitlines()
+        file.close()
+        if version == __version__:
+            return content
+        raise ImportError("version conflict: requires version "+version)
     file.close()
-    if version == __version__:
-        return content
-    raise ImportError("version conflict: requires version "+version)
+    header, chunks, content = readBinary(path)
+    if content is None:
+        raise ImportError("incomplete file: "+path)
+    blocks[header["id"]] = mapChunks(path, chunks)
+    return content
+
+def loadBlocks(path):
+    """Return the arrays written so far in the binary file 'path'."""
+    header, chunks, content = readBinary(path)
+    return mapChunks(path, chunks)
+
+def release(path):
+    """Remove the arrays of the binary file 'path' from 'blocks'."""
+    with open(path, "rb") as file:
+        blocks.pop(readHeader(file, path)["id"], None)
+
+def readHeader(file, path):
+    """Return the header of the binary file 'path' opened as 'file'."""
+    if file.read(len(magic)) != magic:
+        raise ImportError(path+" is not a binary file")
+    size, = struct.unpack("<I", file.read(4))
+    header = json.loads(file.read(size).decode())
+    if header["format"] != Recorder.format:
+        raise ImportError("unknown format: "+str(header["format"]))
+    return header
+
+def readBinary(path):
+    """Return the header, the complete chunks and the expression (None if
+    not written yet) of the binary file 'path'."""
+    chunks, content, end = {}, None, os.path.getsize(path)
+    with open(path, "rb") as file:
+        header = readHeader(file, path)
+        while True:
+            tag = file.read(1)
+            if tag == b"C":
+                record = file.read(6)
+                if len(record) < 6: # chunk being written
+                    break
+                block, kind, ndim = struct.unpack("<IcB", record)
+                record = file.read(4*ndim+9)
+                if len(record) < 4*ndim+9:
+                    break
+                shape = struct.unpack("<"+"I"*ndim, record[:4*ndim])
+                count, pad = struct.unpack("<QB", record[4*ndim:])
+                dtype = Recorder.dtypes[kind]
+                offset = file.tell()+pad
+                size = (count*numpy.prod(shape, dtype=int)
+                        *numpy.dtype(dtype).itemsize)
+                if offset+size > end:
+                    break
+                chunks.setdefault(block, []).append((offset, dtype,
+                                                     (count,)+shape))
+                file.seek(offset+size)
+            elif tag == b"E":
+                size, = struct.unpack("<Q", file.read(8))
+                content = file.read(size).decode()
+            else:
+                break
+    return header, chunks, content
+
+def mapChunks(path, chunks):
+    """Return the arrays of the 'chunks' of the binary file 'path'."""
+    arrays = {}
+    for block in chunks:
+        a = [numpy.memmap(path, dtype, "c", offset, shape)
+             for offset, dtype, shape in chunks[block]]
+        arrays[block] = a[0] if len(a) is 1 else numpy.concatenate(a)
+    return arrays
+
+class Recorder:
+    """Writes data to a binary file by chunks of arrays."""
+
+    format = 2 # version of the binary format
+    dtypes = {b"f": "<f8", b"c": "<c16"} # types of the array elements
+    current = None # recorder used to represent the arrays
+
+    def __init__(self, path):
+        self.file = open(path, "wb")
+        self.id = uuid.uuid4().hex # identifier of the file in 'blocks'
+        header = json.dumps({"format": Recorder.format, "id": self.id,
+                             "version": __version__}).encode()
+        self.file.write(magic+struct.pack("<I", len(header))+header)
+        self.file.flush() # readable during the run (see loadBlocks)
+        self.written = {} # block number and rows written of each storage
+
+    def block(self, storage):
+        """Write the new rows of 'storage' and return its block number."""
+        if id(storage) not in self.written:
+            self.written[id(storage)] = [len(self.written), 0, storage]
+        entry = self.written[id(storage)]
+        array = storage.array[entry[1]:]
+        if len(array) is not 0:
+            kind = b"c" if array.dtype.kind == "c" else b"f"
+            array = numpy.ascontiguousarray(array, Recorder.dtypes[kind])
+            shape = array.shape[1:]
+            record = b"C"+struct.pack("<IcB", entry[0], kind, len(shape))
+            record += struct.pack("<"+"I"*len(shape), *shape)
+            pad = -(self.file.tell()+len(record)+9) % 16
+            record += struct.pack("<QB", len(array), pad)+bytes(pad)
+            self.file.write(record+array.tobytes())
+            entry[1] += len(array)
+        return entry[0]
+
+    def write(self, *args):
+        """Write the new rows of the storages on the disk."""
+        for storage in arguments(args):
+            self.block(storage)
+        self.file.flush()
+
+    def close(self, data):
+        """Write the expression of 'data' and close the file."""
+        Recorder.current = self
+        try:
+            content = repr(data).encode()
+        finally:
+            Recorder.current = None
+        self.file.write(b"E"+struct.pack("<Q", len(content))+content)
+        self.file.close()
 
     #========= UNIT ERRORS ===============================================#
 
 class UnitError(ValueError):
     """Non homogenous operation or incorrect unit."""
 
+    #========= VALIDATION ================================================#
+
+class Validation:
+    """Level of verification of the arguments:
+    - "strict": at each call
+    - "first": at the first call from each call site
+    - "off": never"""
+
+    levels = ("strict", "first", "off")
+
+    level = "strict" # current level
+    skip = False     # True if the check functions are skipped
+
+def setValidation(level):
+    """Set the verification level of the arguments."""
+    if level not in Validation.levels:
+        raise ValueError(str(level)+" is not a valid validation level")
+    Validation.level = level
+    Validation.skip = level == "off"
+
     #========= ARGUMENTS =================================================#
 
 def arguments(args):
@@ -44,6 +191,10 @@ def arguments(args):
 
 def checkType(args, t=None):
     """Check the type of the items in 'args'."""
+    if Validation.skip:
+        if t is None:
+            return type(args[0])
+        return
     if t is None: # the arguments must have the same type
         for i in range(1, len(args)):
             if type(args[0]) is not type(args[i]):
@@ -57,6 +208,10 @@ def checkType(args, t=None):
             
 def checkSize(args, s=None):
     """Check the size of the items in 'args'."""
+    if Validation.skip:
+        if s is None:
+            return len(args[0])
+        return
     if s is None: # the arguments must be the same size
         for i in range(1, len(args)):
             if len(args[0]) is not len(args[i]):
@@ -70,6 +225,10 @@ def checkSize(args, s=None):
 
 def checkUnit(args, u=None):
     """Check the unit of the items in 'args'."""
+    if Validation.skip:
+        if u is None:
+            return args[0].unit
+        return
     if u is None: # the arguments must have the same unit
         for i in range(1, len(args)):
             if args[0].unit != args[i].unit:
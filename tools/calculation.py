@@ -5,6 +5,9 @@
 
     #========= IMPORTS ===================================================#
 
+import sys
+import numpy
+import weakref
 from .quantities import *
 
     #========= TYPE MANAGEMENT ===========================================#
@@ -34,15 +37,35 @@ def functionMaker(magFun, uniFun=None):
     """Return the generalized version of the function."""
     if uniFun is None:
         def uniFun(u):
-            if u.dimension != [0, 0, 0, 0, 0, 0, 0]:
-                raise DimensionError("the quantity is not dimensionless")
-            return [0, 0, 0, 0, 0, 0, 0]
+            if u is not Unit():
+                raise UnitError("the quantity is not dimensionless")
+            return u
+    sites = {} # signatures and units of the results by code and position
     def aux1(*args1):
         args1 = arguments(args1)
+        checked = None # checked calls at the call site ("first")
+        if Validation.level == "first":
+            frame = sys._getframe(1) # call site of the generalized function
+            checked, site = sites.get(frame.f_code), frame.f_lasti
+            if checked is None:
+                checked = sites[frame.f_code] = {}
         def aux2(*args2):
-            q = [Quantity(makeCallable(a)(*args2)) for a in args1]
+            q = [a(*args2) if callable(a) else a for a in args1]
+            q = [a if isinstance(a, Quantity) else Quantity(a) for a in q]
             m, u = [a.magnitude for a in q], [a.unit for a in q]
-            return Quantity(magFun(*m), uniFun(*u))
+            if checked is None or Validation.level != "first":
+                return Quantity(magFun(*m), uniFun(*u))
+            types = [type(a) for a in m]
+            last = checked.get(site) # units are interned: compared by id
+            if last is None or last[0] != u or last[1] != types:
+                result = Quantity(magFun(*m), uniFun(*u))
+                checked[site] = (u, types, result.unit)
+                return result
+            Validation.skip = True
+            try:
+                return Quantity(magFun(*m), last[2])
+            finally:
+                Validation.skip = False
         return appropriateType(aux2, args1)
     return aux1
 
@@ -66,6 +89,8 @@ norm = functionMaker(magNorm(2), uniAdd)
 
 inv = functionMaker(magInv, uniPwr(-1))
 
+solve = functionMaker(magSolve, lambda a, b: uniDiv(b, a))
+
 rotMat = functionMaker(magRotMat)
 
 sin = functionMaker(math.sin)
@@ -95,26 +120,84 @@ def det(m):
 def com(i):
     return functionMaker(magCom(i), uniAdd)
 
+rejecting = weakref.WeakSet() # functions which do not accept dual numbers
+
+def dualEval(f, r, seed):
+    """Return the rank, the derivatives and the unit of 'f'('r') (or None)."""
+    r = Quantity(r)
+    array = rawArray(r.magnitude)
+    if isinstance(array, Dual):
+        raise DualError("nested dual numbers are not supported")
+    try:
+        if f in rejecting:
+            return None
+    except TypeError: # not referenceable
+        pass
+    x = Dual(array, seed)
+    if isinstance(r.magnitude, (Vector, Matrix, VectorArray, MatrixArray)):
+        x = type(r.magnitude)(x)
+    try:
+        y = Quantity(f(Quantity(x, r.unit)))
+    except DualError:
+        try:
+            rejecting.add(f)
+        except TypeError:
+            pass
+        return None
+    array = rawArray(y.magnitude)
+    if isinstance(array, Dual):
+        der = array.der
+    else: # constant function
+        der = numpy.zeros(numpy.shape(array)+seed.shape[-1:])
+    return rank(y.magnitude), der, y.unit
+
+def derivative(der, rank):
+    """Return the magnitude of rank 'rank' stored in the array 'der'."""
+    if rank is 0 and der.ndim is 0:
+        return der.item()
+    if rank is 1 and der.ndim is 1:
+        return Vector(der)
+    return fromArray(der, rank)
+
 def der(f, d=0.001):
     """Return the derivative of the function 'f'."""
     def aux(x):
-        delta = sub(f(add(x, Quantity(d, x.unit))),
-                    f(sub(x, Quantity(d, x.unit))))
-        if not isinstance(delta.magnitude, Vector.scalars):
-            raise ValueError("'f' is not a scalar function")
-        return Quantity((delta).magnitude/(2*d), uniDiv(delta.unit, x.unit))
+        seed = numpy.ones(numpy.shape(rawArray(x.magnitude))+(1,))
+        result = dualEval(f, x, seed)
+        if result is not None:
+            n, dy, unit = result
+            if n is not 0:
+                raise ValueError("'f' is not a scalar function")
+            return Quantity(derivative(dy[..., 0], 0), uniDiv(unit, x.unit))
+        return difference(f, x, d)
     return aux
 
+def difference(f, x, d):
+    """Return the central difference of step 'd' of 'f' at 'x'."""
+    delta = sub(f(add(x, Quantity(d, x.unit))), f(sub(x, Quantity(d, x.unit))))
+    if not isinstance(delta.magnitude, Vector.scalars):
+        raise ValueError("'f' is not a scalar function")
+    return Quantity((delta).magnitude/(2*d), uniDiv(delta.unit, x.unit))
+
 def parDer(i, d=0.001):
     """Return the partial derivative function with respect to axis 'i'."""
     def aux1(f):
         def aux2(r):
+            seed = numpy.zeros(rawArray(r.magnitude).shape+(1,))
+            seed[..., i, 0] = 1
+            result = dualEval(f, r, seed)
+            if result is not None:
+                n, dy, unit = result
+                if n is not 0:
+                    raise ValueError("'f' is not a scalar function")
+                return Quantity(derivative(dy[..., 0], 0),
+                                uniDiv(unit, r.unit))
             def g(x):
                 # g: scalar -> scalar
                 v = r.copy()
                 v.magnitude[i] += x.magnitude
                 return f(v)
-            return der(g, d)(Quantity(0, r.unit))
+            return difference(g, Quantity(0, r.unit), d)
         return aux2
     return aux1
 
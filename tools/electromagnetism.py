@@ -13,6 +13,34 @@ from .mechanics import *
 mu_0 = Quantity(4*math.pi*10**-7, "H.m-1") # Vacuum permeability
 epsilon_0 = Quantity(8.854187817*10**-12, "F.m-1") # Permittivity
 
+    #========= SOURCES ===================================================#
+
+class CircularLoop(Solid):
+    """Represents a circular loop of radius 'r' in the plane (O, x, y)."""
+
+    def __init__(self, cfg, r, m=1, q=0, i=0, M=Vector(0, 0, 0), n=72):
+        checkType([n], int)
+        self.n = n # number of segments of the displayed path
+        Solid.__init__(self, cfg, regularPolygon(n, r), m, q, i, M)
+        self.radius = r
+
+    @property
+    def radius(self):
+        return self._radius
+
+    @radius.setter
+    def radius(self, r):
+        r = Quantity(r, "m")
+        checkUnit([r], Unit("m"))
+        checkType([r.magnitude], (int, float))
+        self._radius = r
+        self.shp = regularPolygon(self.n, r)
+
+    def __repr__(self):
+        args = [self.cfg, self.radius, self.m, self.q, self.i, self.M]
+        args = ", ".join([repr(a) for a in args])
+        return "CircularLoop("+args+", "+repr(self.n)+")"
+
     #========= POTENTIALS ================================================#
 
 def electricPotential(solid):
@@ -52,26 +80,156 @@ def electricField(origin):
             return mul(div(origin.q, mul(4*math.pi, epsilon_0, pwr(3)(n))), r)
         return aux
     raise TypeError(name(origin)+" is not a valid origin")
-        
+
+def treeElectricField(solids, theta=0.5, eps=0):
+    """Return the electric field of the charges 'solids' using octrees."""
+    checkType(solids, Solid)
+    eps = Quantity(eps, "m")
+    checkUnit([eps], Unit("m"))
+    k = 1/(4*math.pi*epsilon_0.magnitude)
+    def aux(r):
+        r = Quantity(r, "m")
+        checkUnit([r], Unit("m"))
+        p = rawArray(r.magnitude).reshape(-1, 3)
+        E = numpy.zeros(p.shape)
+        sp = [rawArray(s.cfg.position.magnitude) for s in solids]
+        sp = numpy.array(sp, dtype=float).reshape(-1, 3)
+        sc = numpy.array([Quantity(s.q, "C").magnitude for s in solids],
+                         dtype=float)
+        for sign in [1, -1]:
+            charged = sign*sc > 0
+            if charged.any():
+                tree = Octree(sp[charged], sign*sc[charged])
+                E -= sign*tree.field(p, k, theta, eps.magnitude)
+        if isBatch(r.magnitude):
+            return Quantity(VectorArray(E), "V.m-1")
+        return Quantity(Vector(E[0]), "V.m-1")
+    return aux
+
 def magneticField(origin):
     """Return the magnetic field according to a solid or a potential.""" 
     if callable(origin):
         return curl(origin)
     if isinstance(origin, Solid):
         checkType([origin.shp], Path)
+        unit = unitMagneticField(origin)
         def aux(r):
-            r, p = origin.cfg.inside(Quantity(r, "m")), []
-            for i in range(len(origin.shp)-1):
-                r_dl = mul((1/2), add(origin.shp[i], origin.shp[i+1]))
-                dl, a = sub(origin.shp[i+1], origin.shp[i]), sub(r, r_dl)
-                n = norm(a)
-                if n.magnitude != 0:
-                    p.append(div(vecPro(dl, a), pwr(3)(n)))
-            B = mul(mu_0, 1/(4*math.pi), origin.i, add(p))
-            return origin.cfg.basis.outside(B)
+            return mul(origin.i, unit(r))
         return aux
     raise TypeError(name(origin)+" is not a valid origin")
 
+def unitMagneticField(solid):
+    """Return the magnetic field generated by 'solid' for a unit intensity."""
+    checkType([solid], Solid)
+    checkType([solid.shp], Path)
+    if isinstance(solid, CircularLoop):
+        def aux(r):
+            r = solid.cfg.inside(Quantity(r, "m"))
+            a = solid.radius.magnitude
+            s = loopField(a, rawArray(r.magnitude))
+            s = Quantity(fromArray(s, 1) if s.ndim is 2 else Vector(s), "m-1")
+            B = mul(mu_0, 1/math.pi, s)
+            return solid.cfg.basis.outside(B)
+        return aux
+    p = solid.shp.points.array
+    r_dl, dl = (p[1:]+p[:-1])/2, p[1:]-p[:-1] # elements of the path
+    def aux(r):
+        r = solid.cfg.inside(Quantity(r, "m"))
+        s = biotSavart(r_dl, dl, rawArray(r.magnitude))
+        s = Quantity(fromArray(s, 1) if s.ndim is 2 else Vector(s), "m-1")
+        B = mul(mu_0, 1/(4*math.pi), s)
+        return solid.cfg.basis.outside(B)
+    return aux
+
+def biotSavart(r_dl, dl, r, size=2**18):
+    """Return the sum of dl x (r - r_dl) / |r - r_dl|^3 over the elements."""
+    if r.ndim is 1:
+        return biotSavart(r_dl, dl, r[None, :], size)[0]
+    s, n = [numpy.zeros((0, 3))], max(1, size//max(1, len(dl)))
+    for k in range(0, len(r), n):
+        a = r[k:k+n, None, :]-r_dl
+        d = numpy.sqrt((a*a).sum(axis=-1))[..., None]
+        b = numpy.cross(dl, a)/numpy.where(d == 0, 1, d)**3
+        s.append(numpy.where(d == 0, 0, b).sum(axis=1))
+    return numpy.concatenate(s)
+
+def loopField(a, r):
+    """Return mu_0*i/pi times the field of the loop of radius 'a' at 'r'."""
+    if r.ndim is 1:
+        return loopField(a, r[None, :])[0]
+    x, y, z = r[:, 0], r[:, 1], r[:, 2]
+    p2 = x*x+y*y
+    p, r2 = numpy.sqrt(p2), p2+z*z
+    alpha2, beta2 = (a-p)**2+z*z, (a+p)**2+z*z
+    valid = alpha2 > 0
+    alpha2 = numpy.where(valid, alpha2, 1)
+    m = numpy.where(valid, 4*a*p/beta2, 0)
+    K, u = ellipticIntegrals(m, numpy.where(valid, alpha2/beta2, 1))
+    s, d = m/2+u*m*m, 2*alpha2*numpy.sqrt(beta2)
+    q = 16*a*a*K*(1/4+u*(m/2-1))/(beta2*d) # radial field / (rho * z)
+    B = numpy.stack([q*x*z, q*y*z, K*(2*a*(a-p)-(a*a-r2)*s)/d], axis=-1)
+    return numpy.where(valid[:, None], B, 0)
+
+def ellipticIntegrals(m, m1=None, tol=1e-16):
+    """Return K(m) and u(m), E(m) being K(m)*(1-m/2-u(m)*m^2)."""
+    if m1 is None:
+        m1 = 1-m
+    a, b = numpy.ones(numpy.shape(m)), numpy.sqrt(m1)
+    w = 1/(4*(a+b)**2) # c_n^2/m^2
+    u, k, m2 = w, 1, m*m
+    a, b = (a+b)/2, numpy.sqrt(a*b)
+    while numpy.any(w*m2 > (tol*a)**2):
+        c = a+b
+        w = w*w*m2/(4*c*c)
+        a, b = c/2, numpy.sqrt(a*b)
+        k *= 2
+        u = u+k*w
+    return math.pi/(2*a), u
+
+    #========= CACHED FIELDS =============================================#
+
+class CachedField:
+    """Magnetic field of a coil caching the field of a unit intensity."""
+
+    def __init__(self, solid, size=8):
+        checkType([solid], Solid)
+        checkType([solid.shp], Path)
+        checkType([size], int)
+        self.solid = solid
+        self.size = size   # maximum number of cached batches
+        self.cache = {}    # unit fields of the batches of positions
+        self.state = None  # configuration and shape of the cached fields
+        self.unit = None   # unit field function
+
+    def __call__(self, r):
+        r = Quantity(r, "m")
+        state = self.current()
+        if state != self.state:
+            self.state, self.cache = state, {}
+            self.unit = unitMagneticField(self.solid)
+        if not isBatch(r.magnitude) or isinstance(r.magnitude.array, Dual):
+            return mul(self.solid.i, self.unit(r))
+        key = rawArray(r.magnitude).tobytes()
+        if key in self.cache:
+            B = self.cache.pop(key) # moved to the most recent position
+        else:
+            B = self.unit(r)
+            if len(self.cache) >= self.size:
+                del self.cache[next(iter(self.cache))]
+        self.cache[key] = B
+        return mul(self.solid.i, B)
+
+    def current(self):
+        """Return the state on which the cached fields depend."""
+        cfg = self.solid.cfg
+        return (cfg.position.magnitude.array.tobytes(),
+                cfg.basis.matrixBtoE.array.tobytes(),
+                self.solid.shp.points.array.tobytes())
+
+    def clear(self):
+        """Empty the cache."""
+        self.state, self.cache = None, {}
+
     #========= FORCES ====================================================#
 
 def lorentzForce(solid, E, v, B):
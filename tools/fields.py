@@ -5,43 +5,90 @@
 
     #========= IMPORTS ===================================================#
 
+import os
+import numpy
+import multiprocessing
+import concurrent.futures
 from .frames import *
 from .geometry import *
     
     #========= OPERATORS =================================================#
 
+def jacobian(f, r):
+    """Return the rank, the derivatives and the unit of 'f'('r') (or None)."""
+    r = Quantity(r)
+    shape = rawArray(r.magnitude).shape
+    seed = numpy.broadcast_to(numpy.identity(shape[-1]), shape+shape[-1:])
+    return dualEval(f, r, seed)
+
 def gradient(f, d=0.001):
     """Return the gradient of 'f'."""
+    if isinstance(f, Field):
+        J, unit = gridJacobian(f, 0)
+        return f.derived(J, unit)
     def aux(r):
-        return vec([parDer(i, d)(f)(r) for i in range(len(r))])
+        result = jacobian(f, r)
+        if result is None:
+            return vec([parDer(i, d)(f)(r) for i in range(len(r))])
+        n, J, unit = result
+        if n is not 0:
+            raise ValueError("'f' is not a scalar function")
+        return Quantity(derivative(J, 1), uniDiv(unit, r.unit))
     return aux
 
 def divergence(v, d=0.001):
     """Return the divergence of 'v'."""
+    if isinstance(v, Field):
+        J, unit = gridJacobian(v, 1)
+        return v.derived(numpy.trace(J, axis1=-2, axis2=-1), unit)
     def aux(r):
-        return add([parDer(i, d)(com(i)(v))(r) for i in range(len(r))])
+        result = jacobian(v, r)
+        if result is None:
+            return add([parDer(i, d)(com(i)(v))(r) for i in range(len(r))])
+        n, J, unit = result
+        if n is not 1:
+            raise ValueError("'v' is not a vector function")
+        div = numpy.trace(J, axis1=-2, axis2=-1)
+        return Quantity(derivative(div, 0), uniDiv(unit, r.unit))
     return aux
 
 def scaLap(f, d=0.001):
     """Return the scalar Laplacian of 'f'."""
+    if isinstance(f, Field):
+        return gridLaplacian(f, 0)
     return divergence(gradient(f, d), d)
 
 def vecLap(v, d=0.001):
     """Return the vector Laplacian of 'v'."""
+    if isinstance(v, Field):
+        return gridLaplacian(v, 1)
     def aux(r):
         return vec([scaLap(com(i)(v), d)(r) for i in range(len(r))])
     return aux
 
 def curl(v, d=0.001):
     """Return the curl of 'v'."""
+    if isinstance(v, Field):
+        J, unit = gridJacobian(v, 1)
+        c = numpy.stack([J[..., 2, 1]-J[..., 1, 2], J[..., 0, 2]-J[..., 2, 0],
+                         J[..., 1, 0]-J[..., 0, 1]], axis=-1)
+        return v.derived(c, unit)
     v_x = com(0)(v)
     v_y = com(1)(v)
     v_z = com(2)(v)
     def aux(r):
-        x = sub(parDer(1,d)(v_z)(r), parDer(2,d)(v_y)(r))
-        y = sub(parDer(2,d)(v_x)(r), parDer(0,d)(v_z)(r))
-        z = sub(parDer(0,d)(v_y)(r), parDer(1,d)(v_x)(r))
-        return vec(x, y, z)
+        result = jacobian(v, r)
+        if result is None:
+            x = sub(parDer(1,d)(v_z)(r), parDer(2,d)(v_y)(r))
+            y = sub(parDer(2,d)(v_x)(r), parDer(0,d)(v_z)(r))
+            z = sub(parDer(0,d)(v_y)(r), parDer(1,d)(v_x)(r))
+            return vec(x, y, z)
+        n, J, unit = result
+        if n is not 1:
+            raise ValueError("'v' is not a vector function")
+        c = numpy.stack([J[..., 2, 1]-J[..., 1, 2], J[..., 0, 2]-J[..., 2, 0],
+                         J[..., 1, 0]-J[..., 0, 1]], axis=-1)
+        return Quantity(derivative(c, 1), uniDiv(unit, r.unit))
     return aux
 
     #========= FIELD =====================================================#
@@ -88,49 +135,243 @@ class Field:
         theta, phi = math.pi*(j/self.n[1]), 2*math.pi*(k/self.n[2])
         return self.cfg.outside(fromSpherical(mul(self.spg,i+1), theta, phi))
 
-    def sample(self, f):
-        self.n[3] +=1
-        for i in range(self.n[0]):
-            for j in range(self.n[1]):
-                for k in range(self.n[2]):
-                    self.stg.add(f(self.position(i, j, k)))
+    def positions(self):
+        """Return the positions of all the samples in the storage order."""
+        i, j, k = numpy.meshgrid(*[numpy.arange(n) for n in self.n[:3]],
+                                 indexing="ij")
+        i, j, k, spg = i.ravel(), j.ravel(), k.ravel(), self.spg.magnitude
+        if self.vol.geometry is "cuboid":
+            v = [i-(self.n[0]-1)/2, j-(self.n[1]-1)/2, k-(self.n[2]-1)/2]
+            v = spg*numpy.stack(v, axis=-1)
+        elif self.vol.geometry is "cylinder":
+            r, phi, z = spg*(i+1), 2*math.pi*(j/self.n[1]), spg*(k-self.n[2]/2)
+            v = numpy.stack([r*numpy.cos(phi), r*numpy.sin(phi), z], axis=-1)
+        else:
+            r, theta = spg*(i+1), math.pi*(j/self.n[1])
+            phi = 2*math.pi*(k/self.n[2])
+            v = numpy.stack([r*numpy.sin(theta)*numpy.cos(phi),
+                             r*numpy.sin(theta)*numpy.sin(phi),
+                             r*numpy.cos(theta)], axis=-1)
+        return self.cfg.outside(Quantity(VectorArray(v), "m"))
+
+    def sample(self, f, vectorized=None):
+        """Add the values of 'f' at the positions of the samples."""
+        self.stg.extend(batchValues(f, self.positions(), vectorized))
+        self.n[3] += 1
         
     def value(self, i, j, k, t=0):
         return self.stg[k + self.n[2]*(j + self.n[1]*(i + self.n[0]*t))]
 
-    #========= APPROXIMATION =============================================#
+    def grid(self):
+        """Return the samples in an array of shape (n3, n0, n1, n2, ...)."""
+        a = self.stg.array
+        return a.reshape((self.n[3],)+tuple(self.n[:3])+a.shape[1:])
 
-def continuousApproximation(field, t=0):
-    """Return a continuous function of the field according to the samples."""
+    def derived(self, array, unit):
+        """Return the field of same sampling of the samples 'array'."""
+        magType = [float, Vector, Matrix][array.ndim-4]
+        stg = Storage(unit, magType, array.reshape((-1,)+array.shape[4:]))
+        return Field(self.vol, self.spg, self.cfg.copy(), stg, list(self.n))
+
+def batchValues(f, r, vectorized=None):
+    """Return the values of 'f' at the positions 'r' as a batch:
+    - vectorized=None: one call, then one call per position if it fails
+    - vectorized=True: one call with all the positions
+    - vectorized=False: one call per position"""
+    if vectorized is not False:
+        try:
+            values = Quantity(f(r))
+            if not isBatch(values.magnitude) or len(values) != len(r):
+                raise TypeError("'f' did not return a batch")
+            return values
+        except (TypeError, ValueError):
+            if vectorized:
+                raise
+    values = [Quantity(f(p)) for p in r]
+    unit = checkUnit(values)
+    magnitudes = [a.magnitude for a in values]
+    array = numpy.array([rawArray(m) for m in magnitudes])
+    return Quantity(fromArray(array, checkRank(magnitudes)), unit)
+
+    #========= GRID OPERATORS ============================================#
+
+def gridSamples(field, r, n):
+    """Return the checked samples of rank 'r' of the cuboid 'field'."""
     checkType([field], Field)
-    checkType([t], int)
     if field.vol.geometry is not "cuboid":
         raise ValueError("invalid field shape: "+field.vol.geometry)
-    
-    def aux(r):
-        r = field.cfg.inside(Quantity(r, "m")).magnitude
-        for axe in range(3):
-            if abs(r[axe]) > field.spg.magnitude*(field.n[axe]-1)/2:
+    if min(field.n[:3]) < n:
+        raise ValueError("at least "+str(n)+" samples per axis are required")
+    a = field.grid()
+    if a.ndim-4 is not r:
+        raise TypeError("rank "+str(a.ndim-4)+" invalid, "
+                        +str(r)+" requested")
+    return a
+
+def gridJacobian(field, r):
+    """Return the derivatives and the unit of the samples of 'field'."""
+    a, h = gridSamples(field, r, 3), field.spg.magnitude
+    d = numpy.stack(numpy.gradient(a, h, axis=(1, 2, 3), edge_order=2), -1)
+    J = d @ field.cfg.basis.matrixInverse().array
+    return J, uniDiv(field.stg.unit, Unit("m"))
+
+def gridLaplacian(field, r):
+    """Return the field of the Laplacians of the samples of 'field'."""
+    a, h = gridSamples(field, r, 4), field.spg.magnitude
+    lap = 0
+    for axis in (1, 2, 3):
+        b = numpy.moveaxis(a, axis, 0)
+        d = numpy.empty_like(b)
+        d[1:-1] = b[2:]-2*b[1:-1]+b[:-2]
+        d[0] = 2*b[0]-5*b[1]+4*b[2]-b[3]
+        d[-1] = 2*b[-1]-5*b[-2]+4*b[-3]-b[-4]
+        lap = lap+numpy.moveaxis(d, 0, axis)/h**2
+    return field.derived(lap, uniDiv(field.stg.unit, Unit("m2")))
+
+    #========= PARALLEL SAMPLING =========================================#
+
+class Sampler:
+    """Samples fields with a pool of processes."""
+
+    task = None # functions, positions and mode of the current process
+
+    def __init__(self, workers=None, size=None):
+        if workers is None:
+            workers = os.cpu_count() or 1
+        self.workers, self.size = workers, size
+
+    @staticmethod
+    def initialize(*task):
+        Sampler.task = task
+
+    @staticmethod
+    def run(task):
+        functions, r, vectorized = Sampler.task
+        t, start, stop = task
+        return batchValues(functions[t], r[start:stop], vectorized)
+
+    def sample(self, field, f, vectorized=None):
+        """Sample 'f' or the functions of the list 'f' on 'field'."""
+        checkType([field], Field)
+        functions = f if isinstance(f, list) else [f]
+        r = field.positions()
+        if self.workers is 1: # no pool
+            for g in functions:
+                field.sample(g, vectorized)
+            return
+        size = self.size
+        if size is None:
+            size = -(-len(r)*len(functions)//(4*self.workers))
+        tasks = [(t, start, min(start+size, len(r)))
+                 for t in range(len(functions))
+                 for start in range(0, len(r), size)]
+        if "fork" in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context("fork")
+        else:
+            context = None
+        pool = concurrent.futures.ProcessPoolExecutor(self.workers,
+                   mp_context=context, initializer=Sampler.initialize,
+                   initargs=(functions, r, vectorized))
+        with pool:
+            values = list(pool.map(Sampler.run, tasks))
+        for v in values:
+            field.stg.extend(v)
+        field.n[3] += len(functions)
+
+    #========= APPROXIMATION =============================================#
+
+class Interpolator:
+    """Continuous approximation of the time slice 't' of a sampled field:
+    - mode "linear": trilinear interpolation
+    - mode "cubic": tricubic interpolation (Catmull-Rom splines)"""
+
+    modes = ("linear", "cubic")
+    periodic = {"cuboid": (False, False, False),
+                "cylinder": (False, True, False),
+                "sphere": (False, False, True)}
+
+    def __init__(self, field, t=0, mode="linear"):
+        checkType([field], Field)
+        checkType([t], int)
+        if mode not in Interpolator.modes:
+            raise ValueError(str(mode)+" is not a valid mode")
+        self.field, self.t, self.mode = field, t, mode
+        self.samples = field.grid()[t].copy()
+        self.rank = self.samples.ndim-3
+        self.periodic = Interpolator.periodic[field.vol.geometry]
+        for axis in range(3):
+            if not self.periodic[axis] and field.n[axis] < 2:
+                raise ValueError("at least 2 samples per axis are required")
+            if not self.periodic[axis] and mode == "cubic":
+                s = numpy.moveaxis(self.samples, axis, 0)
+                s = numpy.concatenate([2*s[:1]-s[1:2], s, 2*s[-1:]-s[-2:-1]])
+                self.samples = numpy.moveaxis(s, 0, axis)
+
+    def __call__(self, r):
+        r = Quantity(r, "m")
+        checkUnit([r], Unit("m"))
+        x = rawArray(self.field.cfg.inside(r).magnitude)
+        single = x.ndim is 1
+        if single:
+            x = x[None, :]
+        values = self.interpolate(self.coordinates(x))
+        if single and self.rank is 0:
+            values = values[0].item()
+        elif single:
+            values = Vector(values[0]) if self.rank is 1 else Matrix(values[0])
+        else:
+            values = fromArray(values, self.rank)
+        return Quantity(values, self.field.stg.unit)
+
+    def coordinates(self, x):
+        """Return the coordinates in the grid of the positions 'x'."""
+        n, h = self.field.n, self.field.spg.magnitude
+        x0, x1, x2 = x[:, 0], x[:, 1], x[:, 2]
+        geometry = self.field.vol.geometry
+        if geometry is "cuboid":
+            return [x0/h+(n[0]-1)/2, x1/h+(n[1]-1)/2, x2/h+(n[2]-1)/2]
+        rho2 = x0*x0+x1*x1
+        phi = numpy.arctan2(x1, x0) % (2*math.pi)
+        if geometry is "cylinder":
+            return [numpy.sqrt(rho2)/h-1, phi*n[1]/(2*math.pi), x2/h+n[2]/2]
+        theta = numpy.arctan2(numpy.sqrt(rho2), x2)
+        rho = numpy.sqrt(rho2+x2*x2)
+        return [rho/h-1, theta*n[1]/math.pi, phi*n[2]/(2*math.pi)]
+
+    def stencil(self, u, axis):
+        """Return the weights and the indices of the samples along 'axis'."""
+        n = self.field.n[axis]
+        v = u.val if isinstance(u, Dual) else u
+        if self.periodic[axis]:
+            i = numpy.floor(v)
+        else:
+            if not numpy.all((v >= 0) & (v <= n-1)):
                 raise ValueError("'r' is outside the sampled zone")
-        i = (field.n[0]-1)//2 + int(r[0]/field.spg.magnitude)
-        j = (field.n[1]-1)//2 + int(r[1]/field.spg.magnitude)
-        k = (field.n[2]-1)//2 + int(r[2]/field.spg.magnitude)
-        if i is field.n[0]-1:
-            i -=1
-        if j is field.n[1]-1:
-            j -=1
-        if k is field.n[2]-1:
-            k -=1
-        d = [[r[0] - field.spg.magnitude*(i-(field.n[0]-1)/2)],
-             [r[1] - field.spg.magnitude*(j-(field.n[1]-1)/2)],
-             [r[2] - field.spg.magnitude*(k-(field.n[2]-1)/2)]]
-        for axe in range(3):
-            d[axe].append(field.spg.magnitude - d[axe][0])
-        values, weight, totVol = [], [], field.spg.magnitude**3
-        for c in range(2):
-            for b in range(2):
-                for a in range(2):
-                    values.append(field.value(i+a, j+b, k+c, t))
-                    weight.append(d[0][1-a]*d[1][1-b]*d[2][1-c]/totVol)
-        return add([mul(weight[i], values[i]) for i in range(8)])
-    return aux
+            i = numpy.clip(numpy.floor(v), 0, n-2)
+        f = u-i
+        if self.mode == "linear":
+            w, offsets = [1-f, f], numpy.arange(2)
+        else:
+            w = [((2-f)*f-1)*f/2, ((3*f-5)*f*f+2)/2,
+                 ((4-3*f)*f+1)*f/2, (f-1)*f*f/2]
+            offsets = numpy.arange(-1, 3)
+        i = i.astype(int)[:, None]+offsets
+        if self.periodic[axis]:
+            i = i % n
+        elif self.mode == "cubic":
+            i = i+1 # extended grid
+        return numpy.stack(w, axis=-1), i
+
+    def interpolate(self, u):
+        """Return the interpolated values at the coordinates 'u'."""
+        (w0, i0), (w1, i1), (w2, i2) = [self.stencil(u[a], a)
+                                        for a in range(3)]
+        samples = self.samples[i0[:, :, None, None], i1[:, None, :, None],
+                               i2[:, None, None, :]]
+        w = w0[:, :, None, None]*w1[:, None, :, None]*w2[:, None, None, :]
+        w = w.reshape(w.shape+(1,)*self.rank)
+        return (w*samples).sum(axis=(1, 2, 3))
+
+def continuousApproximation(field, t=0, mode="linear"):
+    """Return a continuous function of the field (see Interpolator)."""
+    return Interpolator(field, t, mode)
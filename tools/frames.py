@@ -32,9 +32,9 @@ class Basis:
     def inside(self, a):
         def aux(*args):
             q = Quantity(makeCallable(a)(*args), "m")
-            if isinstance(q.magnitude, Vector):
+            if isinstance(q.magnitude, (Vector, VectorArray)):
                 return mul(self.matrixInverse(), q)
-            if isinstance(q.magnitude, Matrix):
+            if isinstance(q.magnitude, (Matrix, MatrixArray)):
                 return mul(self.matrixInverse(), q, self.matrixBtoE)
             raise TypeError("no change of basis for "+str(type(q.magnitude)))
         return appropriateType(aux, [a])
@@ -42,9 +42,9 @@ class Basis:
     def outside(self, a):
         def aux(*args):
             q = Quantity(makeCallable(a)(*args), "m")
-            if isinstance(q.magnitude, Vector):
+            if isinstance(q.magnitude, (Vector, VectorArray)):
                 return mul(self.matrixBtoE, q)
-            if isinstance(q.magnitude, Matrix):
+            if isinstance(q.magnitude, (Matrix, MatrixArray)):
                 return mul(self.matrixBtoE, q, self.matrixInverse())
             raise TypeError("no change of basis for "+str(type(q.magnitude)))
         return appropriateType(aux, [a])
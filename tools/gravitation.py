@@ -21,20 +21,44 @@ def gravitationalPotential(solid):
         return -div(mul(G, solid.m), norm(sub(r, solid.cfg.position)))
     return aux
 
-def gravitationalField(origin):
+def gravitationalField(origin, eps=0, kernel="plummer"):
     """Return the gravitational field according to a potential or a solid."""
     if callable(origin):
         return mul(-1, gradient(origin))
     if isinstance(origin, Solid):
+        eps = Quantity(eps, "m")
+        checkUnit([eps], Unit("m"))
+        softening(0, eps.magnitude, kernel) # checks the kernel
         def aux(r):
             r = sub(r, origin.cfg.position)
-            n = norm(r)
-            if n.magnitude == 0:
-                return Quantity(Vector(0, 0, 0), "m.s-2")
-            return div(mul(-1, G, origin.m, r), pwr(3)(n))
+            d = rawArray(r.magnitude)
+            w = softening((d*d).sum(axis=-1), eps.magnitude, kernel)
+            w = w if isBatch(r.magnitude) else float(w)
+            return mul(-1, G, origin.m, Quantity(w, "m-3"), r)
         return aux
     raise TypeError(name(origin)+" is not a valid origin")
 
+def treeGravitationalField(solids, theta=0.5, eps=0, kernel="plummer"):
+    """Return the gravitational field of the masses 'solids' with an octree."""
+    checkType(solids, Solid)
+    eps = Quantity(eps, "m")
+    checkUnit([eps], Unit("m"))
+    def aux(r):
+        r = Quantity(r, "m")
+        checkUnit([r], Unit("m"))
+        p = rawArray(r.magnitude).reshape(-1, 3)
+        g = numpy.zeros(p.shape)
+        if len(solids) is not 0:
+            sp = [rawArray(s.cfg.position.magnitude) for s in solids]
+            sm = [Quantity(s.m, "kg").magnitude for s in solids]
+            tree = Octree(numpy.array(sp, dtype=float),
+                          numpy.array(sm, dtype=float))
+            g = tree.field(p, G.magnitude, theta, eps.magnitude, kernel)
+        if isBatch(r.magnitude):
+            return Quantity(VectorArray(g), "m.s-2")
+        return Quantity(Vector(g[0]), "m.s-2")
+    return aux
+
 def gravitationalForce(solid, g):
     """Return the gravitationnel force applied on 'solid'."""
     checkType([solid], Solid)
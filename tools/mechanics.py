@@ -5,6 +5,7 @@
 
     #========= IMPORTS ===================================================#
 
+import numpy
 from .frames import *
 from .geometry import *
 
@@ -52,13 +53,34 @@ class Solid:
 class Trajectory:
     """Generates and saves the trajectory of a solid."""
 
+    integrators = {"euler": "semiImplicitEuler",
+                   "verlet": "velocityVerlet",
+                   "rk4": "rungeKutta4",
+                   "rk45": "dormandPrince"}
+
+    # Butcher tableaux: nodes, matrix, weights, error weights
+    tableaux = {"rk4": ((0, 1/2, 1/2, 1),
+                        ((1/2,), (0, 1/2), (0, 0, 1)),
+                        (1/6, 1/3, 1/3, 1/6),
+                        None),
+                "rk45": ((0, 1/5, 3/10, 4/5, 8/9, 1, 1),
+                         ((1/5,),
+                          (3/40, 9/40),
+                          (44/45, -56/15, 32/9),
+                          (19372/6561, -25360/2187, 64448/6561, -212/729),
+                          (9017/3168, -355/33, 46732/5247, 49/176,
+                           -5103/18656),
+                          (35/384, 0, 500/1113, 125/192, -2187/6784, 11/84)),
+                         (35/384, 0, 500/1113, 125/192, -2187/6784, 11/84, 0),
+                         (71/57600, 0, -71/16695, 71/1920, -17253/339200,
+                          22/525, -1/40))}
+
     def __init__(self, solid, data=None):
         checkType([solid], Solid)
         self.solid = solid
         if data is None:
             self.data = {"times": Storage("s", Vector.scalars),
-                         "mEtoB": Storage("", Matrix),  # orientation
-                         "mBtoE": Storage("", Matrix),  # orientation
+                         "q": Storage("", Vector),      # orientation
                          "p": Storage("m", Vector),     # position
                          "f": Storage("N", Vector),     # force
                          "t": Storage("N.m", Vector),   # torque
@@ -75,12 +97,21 @@ class Trajectory:
         self.iniAngVel = Quantity(Vector(0, 0, 0), "s-1")
         
         # force and torque
-        def zeroForce(time, solid, speed, angularVelocity):
-            return Quantity(Vector(0, 0, 0), "N")
-        def zeroTorque(time, solid, speed, angularVelocity):
-            return Quantity(Vector(0, 0, 0), "N.m")
-        self.F = zeroForce
-        self.T = zeroTorque
+        self.F = Trajectory.zeroForce
+        self.T = Trajectory.zeroTorque
+
+        # integration
+        self.integrator = "euler"
+        self.tol = 10**-8  # relative error per substep ("rk45")
+        self.atol = 10**-9 # absolute error per substep, SI units ("rk45")
+        self.h = None      # last substep length ("rk45")
+        self.reuse = False # reuse of the evaluation at the end ("verlet"),
+                           # only for forces independent of the speeds
+        self.cache = None  # evaluation at the end of the step ("verlet",
+                           # "rk45")
+        self.stage = None  # evaluation of the last stage ("rk45")
+        self.recorder = None # Recorder writing the steps during the run
+        self.chunk = 64      # number of steps written at once (recorder)
         
         # decomposition of the process for n-body simulations
         self.waitingData = False
@@ -88,6 +119,14 @@ class Trajectory:
     def __repr__(self):
         return "Trajectory("+repr(self.solid)+", "+repr(self.data)+")"
 
+    @staticmethod
+    def zeroForce(time, solid, speed, angularVelocity):
+        return Quantity(Vector(0, 0, 0), "N")
+
+    @staticmethod
+    def zeroTorque(time, solid, speed, angularVelocity):
+        return Quantity(Vector(0, 0, 0), "N.m")
+
     def generate(self, timeInterval, dt):
         for i in range(int(div(timeInterval, dt).magnitude)):
             self.calculate(dt)
@@ -96,44 +135,152 @@ class Trajectory:
     def path(self):
         return Path(self.data["p"])
 
+    def basis(self, k):
+        """Return the basis of the solid at the 'k'th saved step."""
+        if "q" in self.data:
+            return quaternionBasis(self.data["q"][k].magnitude)
+        return Basis(self.data["mBtoE"][k], self.data["mEtoB"][k])
+
     def __len__(self):
         return len(self.data["times"])
         
     def calculate(self, dt):
-        """Calculate the new data."""
+        """Calculate the new data with the integrator 'self.integrator'."""
         dt = Quantity(dt, "s")
         if self.waitingData:
             raise Exception("data not saved")
-        self.waitingData = True
+        if self.integrator not in Trajectory.integrators:
+            raise ValueError(str(self.integrator)+" is not an integrator")
+        self.waitingData, self.next = True, None
         if len(self) is 0:
             self.solid.calculateTensor()
             self.time = -dt
             self.s = self.iniSpe
             self.av = self.iniAngVel
+        self.orientation = orientation(self.solid.cfg.basis)
         self.time = add(dt, self.time)
-        #1 (force and torque)
-        self.f = self.F(self.time, self.solid, self.s, self.av)
-        self.t = self.T(self.time, self.solid, self.s, self.av)
-        #2 (speed)
-        self.a = div(self.f, self.solid.m)
+        getattr(self, Trajectory.integrators[self.integrator])(dt)
+
+    def evaluate(self, time, cfg, s, av):
+        """Return the forces and the accelerations in configuration 'cfg'."""
+        current, self.solid.cfg = self.solid.cfg, cfg
+        try:
+            f = self.F(time, self.solid, s, av)
+            t = self.T(time, self.solid, s, av)
+        finally:
+            self.solid.cfg = current
+        a = div(f, self.solid.m)
+        aa = euler(self.solid.tensor, cfg.basis.inside(t), av)
+        return f, t, a, cfg.basis.outside(aa)
+
+    def orient(self, w, q):
+        """Set the new orientation: 'q' rotated by the vector 'w'."""
+        self.q = rotate(w, q)
+
+    def semiImplicitEuler(self, dt):
+        """First order, one evaluation per step."""
+        cfg = self.solid.cfg
+        self.f, self.t, self.a, self.aa = self.evaluate(self.time, cfg,
+                                                        self.s, self.av)
         self.s = add(self.s, mul(dt, self.a))
-        #3 (angular velocity)
-        M = self.solid.cfg.basis.inside(self.t)
-        self.aa = euler(self.solid.tensor, M, self.av)
-        self.aa = self.solid.cfg.basis.outside(self.aa)
-        self.av = add(self.av, mul(dt, self.aa)) 
-        #4 (position)
-        self.p = add(self.solid.cfg.position, mul(dt, self.s))
-        #5 (orientation)
-        rot = rotMat(mul(dt, self.av))
-        self.mBtoE = mul(rot, self.solid.cfg.basis.matrixBtoE)
-        self.mEtoB = inv(self.mBtoE)
-        
+        self.av = add(self.av, mul(dt, self.aa))
+        self.p = add(cfg.position, mul(dt, self.s))
+        self.orient(mul(dt, self.av), self.orientation)
+
+    def velocityVerlet(self, dt):
+        """Second order, one evaluation per step."""
+        cfg, h = self.solid.cfg, mul(1/2, dt)
+        cache = self.cache if self.reuse else None
+        if cache is not None and sameConfiguration(cfg, cache[0]):
+            self.f, self.t, self.a, self.aa = cache[3]
+        else:
+            self.f, self.t, self.a, self.aa = self.evaluate(self.time, cfg,
+                                                            self.s, self.av)
+        s = add(self.s, mul(h, self.a))
+        av = add(self.av, mul(h, self.aa))
+        self.p = add(cfg.position, mul(dt, s))
+        self.orient(mul(dt, av), self.orientation)
+        cfg = Configuration(self.p, quaternionBasis(self.q))
+        s1, av1 = add(s, mul(h, self.a)), add(av, mul(h, self.aa))
+        end = self.evaluate(add(self.time, dt), cfg, s1, av1)
+        self.s = add(s, mul(h, end[2]))
+        self.av = add(av, mul(h, end[3]))
+        self.next = (cfg, s1, av1, end)
+
+    def rungeKutta4(self, dt):
+        """Fourth order, four evaluations per step."""
+        y, k = self.initialState()
+        y = self.rungeKutta(self.time, dt, y, k, self.orientation, "rk4")[0]
+        self.p, self.s, w, self.av = y
+        self.orient(w, self.orientation)
+
+    def dormandPrince(self, dt):
+        """Fifth order, adaptive substeps."""
+        y, k = self.initialState(self.cache)
+        q, time, remaining = self.orientation, self.time, dt.magnitude
+        h = remaining if self.h is None else min(self.h, remaining)
+        while remaining > 0:
+            step = min(h, remaining)
+            y1, error, k1 = self.rungeKutta(time, Quantity(step, "s"), y, k,
+                                            q, "rk45")
+            factor = min(5, max(1/5, 0.9*error**(-1/5) if error else 5))
+            if error <= 1:
+                time = add(time, Quantity(step, "s"))
+                remaining -= step
+                q = rotate(y1[2], q)
+                y = [y1[0], y1[1], Quantity(Vector(0, 0, 0)), y1[3]]
+                k = [k1[0], k1[1], y1[3], k1[3]] # first same as last
+                h = max(h, step*factor) if step < h else step*factor
+            else:
+                h = step*factor
+            if h < 10**-12*dt.magnitude:
+                raise Exception("step size too small for the tolerance")
+        self.h, self.next = h, self.stage
+        self.p, self.s, w, self.av = y
+        self.orient(w, q)
+
+    def initialState(self, cache=None):
+        """Return the state and its derivatives at the beginning."""
+        cfg = self.solid.cfg
+        if cache is not None and sameState(cache, cfg, self.s, self.av):
+            self.f, self.t, self.a, self.aa = cache[3]
+        else:
+            self.f, self.t, self.a, self.aa = self.evaluate(self.time, cfg,
+                                                            self.s, self.av)
+        y = [cfg.position, self.s, Quantity(Vector(0, 0, 0)), self.av]
+        return y, [self.s, self.a, self.av, self.aa]
+
+    def derivatives(self, time, y, q):
+        """Return the derivatives of the state 'y' = [p, s, w, av]."""
+        p, s, w, av = y
+        cfg = Configuration(p, quaternionBasis(rotate(w, q)))
+        end = self.evaluate(time, cfg, s, av)
+        self.stage = (cfg, s, av, end)
+        return [s, end[2], rotationRate(w, av), end[3]]
+
+    def rungeKutta(self, time, h, y, k, q, method):
+        """Return the state after 'h', its error and the last derivatives."""
+        c, a, b, e = Trajectory.tableaux[method]
+        k = [k]
+        for i in range(1, len(c)):
+            yi = combination(y, h, a[i-1], k)
+            k.append(self.derivatives(add(time, mul(c[i], h)), yi, q))
+        y1 = combination(y, h, b, k)
+        if e is None:
+            return y1, None, k[-1]
+        error = 0
+        for j, d in enumerate(combination(None, h, e, k)):
+            delta = numpy.linalg.norm(rawArray(d.magnitude))
+            scale = self.tol*max(norm(y[j]).magnitude, norm(y1[j]).magnitude)
+            error = max(error, delta/(self.atol+scale))
+        return y1, error, k[-1]
+
     def save(self):
         """Save the new data."""
         if not self.waitingData:
             raise Exception('no waiting data')
         self.waitingData = False
+        self.cache = self.next
         self.data["times"].add(self.time)
         self.data["f"].add(self.f)
         self.data["t"].add(self.t)
@@ -142,15 +289,646 @@ class Trajectory:
         self.data["s"].add(self.s)
         self.data["av"].add(self.av)             
         self.data["p"].add(self.solid.cfg.position)
-        self.data["mBtoE"].add(self.solid.cfg.basis.matrixBtoE)
-        self.data["mEtoB"].add(self.solid.cfg.basis.matrixInverse())
-        self.solid.cfg = Configuration(self.p, Basis(self.mBtoE, self.mEtoB))
+        self.data["q"].add(self.orientation)
+        self.orientation = self.q
+        self.solid.cfg = Configuration(self.p, quaternionBasis(self.q))
+        if len(self) % self.chunk is 0:
+            self.flush()
+
+    def flush(self):
+        """Write the saved steps not yet written in the recorder."""
+        if self.recorder is not None:
+            self.recorder.write(*self.data.values())
 
     def copy(self):
         return eval(repr(self))
 
+    #========= SYSTEMS ===================================================#
+
+class System:
+    """Advances together the trajectories of interacting solids:
+    - forces: interactions, sources and external force 'F' of the system
+    - torques: none, the solids rotate freely (the saved torques are zero)
+    The forces 'F' and the torques 'T' of the trajectories are not used and
+    must keep their default values."""
+
+    integrators = {"euler": "semiImplicitEuler",
+                   "verlet": "velocityVerlet",
+                   "rk4": "rungeKutta4",
+                   "block": "blockSteps"}
+
+    def __init__(self, trajectories, sources=None, G=0, k=0):
+        if sources is None:
+            sources = []
+        checkType(trajectories, Trajectory)
+        checkType(sources, Solid)
+        self.trajectories = list(trajectories)
+        self.sources = list(sources)
+        self.G = Quantity(G, "N.m2.kg-2")
+        self.k = Quantity(k, "N.m2.C-2")
+        checkUnit([self.G], Unit("N.m2.kg-2"))
+        checkUnit([self.k], Unit("N.m2.C-2"))
+
+        # external force
+        def zeroForce(time, positions, speeds):
+            return Quantity(VectorArray(numpy.zeros((len(self), 3))), "N")
+        self.F = zeroForce
+
+        # interactions
+        self.theta = 0                # opening angle (0: direct summation)
+        self.threshold = 1024         # direct summation below this number
+        self.eps = Quantity(0, "m")   # softening length
+        self.kernel = "plummer"       # softening kernel
+        self.encounter = 0            # steps per dynamical time (0: none)
+        self.substeps = 1024          # maximum number of substeps
+
+        # integration
+        self.integrator = "verlet"
+        self.chunk = 64    # number of steps written at once
+        self.records = []  # saved steps not yet written
+        self.recorder = None # Recorder writing the steps during the run
+        self.cache = None  # forces of the current state ("verlet")
+        self.jerks = None  # jerks of the current state ("block")
+        self.eta = 0.02    # step criterion ("block")
+        self.levels = 16   # maximum level of the steps ("block")
+        self.evaluations = 0
+        self.time = None
+        self.waitingData = False
+
+    def __len__(self):
+        return len(self.trajectories)
+
+    def initialize(self, dt):
+        """Read the state of the solids and of the sources."""
+        for t in self.trajectories:
+            if t.F is not Trajectory.zeroForce:
+                raise ValueError("the forces are set by the system ('F')")
+            if t.T is not Trajectory.zeroTorque:
+                raise ValueError("the solids of a system rotate freely")
+        def gather(quantities, unit, size):
+            quantities = [Quantity(q, unit) for q in quantities]
+            checkUnit(quantities, Unit(unit))
+            array = [rawArray(q.magnitude) for q in quantities]
+            return numpy.array(array, dtype=float).reshape((-1,)+size)
+        started = [len(t) is not 0 for t in self.trajectories]
+        if any(started) and not all(started):
+            raise ValueError("the trajectories are not synchronized")
+        if all(started) and len(self) is not 0:
+            self.time = self.trajectories[0].time.magnitude
+        else:
+            self.time = -dt
+            for t in self.trajectories:
+                t.s, t.av = t.iniSpe, t.iniAngVel
+                t.orientation = orientation(t.solid.cfg.basis)
+        solids = [t.solid for t in self.trajectories]
+        self.p = gather([a.cfg.position for a in solids], "m", (3,))
+        self.s = gather([t.s for t in self.trajectories], "m.s-1", (3,))
+        self.av = gather([t.av for t in self.trajectories], "s-1", (3,))
+        self.q = gather([t.orientation for t in self.trajectories], "", (4,))
+        self.m = gather([a.m for a in solids], "kg", ())
+        self.c = gather([a.q for a in solids], "C", ())
+        self.moments = numpy.ones((len(self), 3))
+        for i, a in enumerate(solids):
+            a.calculateTensor()
+            if a.tensor is not None:
+                self.moments[i] = numpy.diag(rawArray(a.tensor.magnitude))
+        self.sp = gather([a.cfg.position for a in self.sources], "m", (3,))
+        self.sm = gather([a.m for a in self.sources], "kg", ())
+        self.sc = gather([a.q for a in self.sources], "C", ())
+
+    def calculate(self, dt):
+        """Calculate the new state of all the solids."""
+        dt = Quantity(dt, "s")
+        checkUnit([dt], Unit("s"))
+        if self.waitingData:
+            raise Exception("data not saved")
+        if self.integrator not in System.integrators:
+            raise ValueError(str(self.integrator)+" is not an integrator")
+        if self.encounter != 0 and self.integrator != "verlet":
+            raise ValueError("the encounters require the integrator verlet")
+        self.waitingData = True
+        if self.time is None:
+            self.initialize(dt.magnitude)
+        self.time += dt.magnitude
+        getattr(self, System.integrators[self.integrator])(dt.magnitude)
+
+    def forces(self, time, p, s, active=None):
+        """Return the forces on the solids of positions 'p' and speeds 's'."""
+        f = Quantity(self.F(Quantity(time, "s"), Quantity(VectorArray(p), "m"),
+                            Quantity(VectorArray(s), "m.s-1")), "N")
+        checkUnit([f], Unit("N"))
+        if active is None:
+            active = slice(None)
+        f, m, c = rawArray(f.magnitude)[active], self.m[active], self.c[active]
+        self.evaluations += len(m)
+        G, k = self.G.magnitude, self.k.magnitude
+        eps = Quantity(self.eps, "m")
+        checkUnit([eps], Unit("m"))
+        sp = numpy.concatenate([p, self.sp])
+        sm = numpy.concatenate([self.m, self.sm])
+        sc = numpy.concatenate([self.c, self.sc])
+        if G != 0 and self.theta > 0 and len(sp) > self.threshold:
+            tree = Octree(sp, sm)
+            f = f+tree.forces(p[active], m, G, self.theta, eps.magnitude,
+                              self.kernel)
+            G = 0
+        if G != 0 or k != 0:
+            f = f+pairForces(p[active], m, c, sp, sm, sc, G, k,
+                             eps.magnitude, self.kernel)
+        return f
+
+    def encounters(self, h):
+        """Return the groups of solids in encounter and their substeps."""
+        n, ns = len(self), len(self.sp)
+        if n is 0:
+            return []
+        G, k, t = self.G.magnitude, self.k.magnitude, self.encounter*h
+        p = numpy.concatenate([self.p, self.sp])
+        s = numpy.concatenate([self.s, numpy.zeros(self.sp.shape)])
+        m = numpy.concatenate([self.m, self.sm])
+        c = numpy.concatenate([self.c, self.sc])
+        inv = numpy.concatenate([1/self.m, numpy.zeros(ns)])
+        mu = 2*(G*self.m.max()+k*numpy.abs(self.c).max()**2*inv.max())
+        v = numpy.sqrt((self.s*self.s).sum(axis=1).max())
+        i, j = closePairs(self.p, max((mu*t*t)**(1/3), 2*v*t))
+        si, sj = numpy.indices((n, ns)).reshape(2, -1)
+        i, j = numpy.concatenate([i, si]), numpy.concatenate([j, n+sj])
+        d, v = p[j]-p[i], s[j]-s[i]
+        r2, v2 = (d*d).sum(axis=1), (v*v).sum(axis=1)
+        mu = G*(m[i]+m[j])+k*numpy.abs(c[i]*c[j])*(inv[i]+inv[j])
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            tau2 = r2*numpy.fmin(numpy.sqrt(r2)/mu, 1/v2)
+            close = numpy.flatnonzero(tau2 < t*t)
+            substeps = numpy.ceil(t/numpy.sqrt(tau2[close]))
+        substeps = numpy.minimum(substeps, self.substeps).astype(int)
+        pairs = zip(i[close].tolist(), j[close].tolist(), substeps.tolist())
+        groups = {} # group of each solid in encounter
+        for i, j, substeps in pairs:
+            a = groups.get(i, ([i], [1]))
+            b = groups.get(j, ([j], [1]))
+            if a is not b:
+                a[0].extend(b[0])
+                a[1][0] = max(a[1][0], b[1][0])
+            a[1][0] = max(a[1][0], substeps)
+            for l in a[0]:
+                groups[l] = a
+        unique = {id(g): g for g in groups.values()}.values()
+        return [(sorted(g[0]), int(g[1][0])) for g in unique]
+
+    def mutual(self, p, members):
+        """Return the forces between the 'members' of a group at 'p'."""
+        n = len(self)
+        b = [i for i in members if i < n]
+        sources = [i-n for i in members if i >= n]
+        sp = numpy.concatenate([p, self.sp[sources]])
+        sm = numpy.concatenate([self.m[b], self.sm[sources]])
+        sc = numpy.concatenate([self.c[b], self.sc[sources]])
+        eps = Quantity(self.eps, "m").magnitude
+        return pairForces(p, self.m[b], self.c[b], sp, sm, sc,
+                          self.G.magnitude, self.k.magnitude, eps,
+                          self.kernel)
+
+    def internal(self, p, groups):
+        """Return the forces between the members of the 'groups' at 'p'."""
+        f = numpy.zeros((len(self), 3))
+        for members, substeps in groups:
+            b = [i for i in members if i < len(self)]
+            f[b] = self.mutual(p[b], members)
+        return f
+
+    def drift(self, s, groups, h):
+        """Return the positions after a drift of duration 'h'."""
+        p = self.p+h*s
+        for members, substeps in groups:
+            b, dt = [i for i in members if i < len(self)], h/substeps
+            p[b] = self.p[b]
+            a = self.mutual(p[b], members)/self.m[b, None]
+            for i in range(substeps):
+                s[b] += dt/2*a
+                p[b] += dt*s[b]
+                a = self.mutual(p[b], members)/self.m[b, None]
+                s[b] += dt/2*a
+        return p
+
+    def rotation(self, h):
+        """Return the rotation state after a free rotation of duration 'h'."""
+        aa = freeRotation(self.av, self.q, self.moments)
+        av = self.av+h/2*aa
+        q = rotate(VectorArray(h*av), VectorArray(self.q)).array
+        av = av+h/2*freeRotation(av, q, self.moments)
+        return aa, av, q
+
+    def semiImplicitEuler(self, h):
+        """First order, one evaluation per step."""
+        f = self.forces(self.time, self.p, self.s)
+        a = f/self.m[:, None]
+        aa = freeRotation(self.av, self.q, self.moments)
+        s, av = self.s+h*a, self.av+h*aa
+        q = rotate(VectorArray(h*av), VectorArray(self.q)).array
+        self.step(self.p+h*s, s, av, q, f, a, aa)
+
+    def velocityVerlet(self, h):
+        """Second order, one evaluation per step."""
+        groups = self.encounters(h) if self.encounter != 0 else []
+        f = self.cache
+        if f is None:
+            f = self.forces(self.time, self.p, self.s)
+        a = f/self.m[:, None]
+        s = self.s+h/2*(f-self.internal(self.p, groups))/self.m[:, None]
+        p = self.drift(s, groups, h)
+        aa, av, q = self.rotation(h)
+        f1 = self.forces(self.time+h, p, s+h/2*a)
+        a1 = (f1-self.internal(p, groups))/self.m[:, None]
+        self.step(p, s+h/2*a1, av, q, f, a, aa)
+        self.next = f1
+
+    def rungeKutta4(self, h):
+        """Fourth order for the translations, four evaluations per step."""
+        c, A, b = Trajectory.tableaux["rk4"][:3]
+        f = self.forces(self.time, self.p, self.s)
+        kp, ks = [self.s], [f/self.m[:, None]]
+        for i in range(1, len(c)):
+            p = self.p+h*sum(w*kp[j] for j, w in enumerate(A[i-1]))
+            s = self.s+h*sum(w*ks[j] for j, w in enumerate(A[i-1]))
+            kp.append(s)
+            ks.append(self.forces(self.time+c[i]*h, p, s)/self.m[:, None])
+        p = self.p+h*sum(w*kp[j] for j, w in enumerate(b))
+        s = self.s+h*sum(w*ks[j] for j, w in enumerate(b))
+        aa, av, q = self.rotation(h)
+        self.step(p, s, av, q, f, ks[0], aa)
+
+    def blockSteps(self, h):
+        """Second order, individual steps h/2^k."""
+        f, ticks = self.cache, 2**self.levels
+        unit = h/ticks
+        if f is None:
+            f = self.forces(self.time, self.p, self.s)
+        a = f/self.m[:, None]
+        jerks = self.jerks
+        if jerks is None: # difference along the motion during a tick
+            f1 = self.forces(self.time+unit, self.p+unit*self.s, self.s)
+            jerks = (f1-f)/self.m[:, None]/unit
+        length = ticks >> self.blockLevels(a, jerks, h)
+        s = self.s+(unit*length/2)[:, None]*a
+        p, acc, jerks = self.p.copy(), a.copy(), jerks.copy()
+        t, end = 0, length.copy()
+        while t < ticks:
+            t1 = end.min()
+            p += (t1-t)*unit*s
+            t = t1
+            active = numpy.flatnonzero(end == t)
+            a1 = self.forces(self.time+t*unit, p, s, active)
+            a1 = a1/self.m[active, None]
+            dt = (unit*length[active])[:, None]
+            jerks[active] = (a1-acc[active])/dt
+            acc[active] = a1
+            s[active] += dt/2*a1
+            if t < ticks:
+                wanted = ticks >> self.blockLevels(a1, jerks[active], h)
+                new = numpy.minimum(wanted, length[active])
+                grow = (wanted > new) & (t % (2*new) == 0)
+                length[active] = numpy.where(grow, 2*new, new)
+                end[active] = t+length[active]
+                s[active] += (unit*length[active]/2)[:, None]*a1
+        aa, av, q = self.rotation(h)
+        self.step(p, s, av, q, f, a, aa)
+        self.next, self.nextJerks = acc*self.m[:, None], jerks
+
+    def blockLevels(self, a, j, h):
+        """Return the levels k of the steps h/2^k of the solids."""
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            dt = self.eta*numpy.sqrt((a*a).sum(axis=1)/(j*j).sum(axis=1))
+            k = numpy.ceil(numpy.log2(h/dt))
+        k = numpy.clip(numpy.nan_to_num(k, nan=0, neginf=0), 0, self.levels)
+        return k.astype(int)
+
+    def step(self, p, s, av, q, f, a, aa):
+        """Keep the new state and the data of the current one."""
+        self.new, self.next, self.nextJerks = (p, s, av, q), None, None
+        self.record = {"times": self.time, "f": f, "a": a, "aa": aa,
+                       "s": s, "av": av, "p": self.p, "q": self.q}
+
+    def save(self):
+        """Save the new data."""
+        if not self.waitingData:
+            raise Exception('no waiting data')
+        self.waitingData = False
+        self.records.append(self.record)
+        self.p, self.s, self.av, self.q = self.new
+        self.cache, self.jerks = self.next, self.nextJerks
+        if len(self.records) >= self.chunk:
+            self.flush()
+
+    def flush(self):
+        """Write the saved steps in the storages of the trajectories."""
+        units = {"times": "s", "f": "N", "t": "N.m", "a": "m.s-2",
+                 "aa": "s-2", "s": "m.s-1", "av": "s-1", "p": "m", "q": ""}
+        if len(self.records) is not 0:
+            data = {key: numpy.array([r[key] for r in self.records])
+                    for key in self.records[0]}
+            data["t"] = numpy.zeros(data["f"].shape)
+            for i, t in enumerate(self.trajectories):
+                for key in units:
+                    if key == "times":
+                        values = data[key]
+                    else:
+                        values = VectorArray(data[key][:, i])
+                    t.data[key].extend(Quantity(values, units[key]))
+            self.records = []
+            if self.recorder is not None:
+                self.recorder.write(*[storage for t in self.trajectories
+                                      for storage in t.data.values()])
+        if self.time is None:
+            return
+        for i, t in enumerate(self.trajectories):
+            t.time = Quantity(self.time, "s")
+            t.s = Quantity(Vector(self.s[i].copy()), "m.s-1")
+            t.av = Quantity(Vector(self.av[i].copy()), "s-1")
+            t.orientation = Vector(self.q[i].copy())
+            position = Quantity(Vector(self.p[i].copy()), "m")
+            t.solid.cfg = Configuration(position,
+                                        quaternionBasis(t.orientation))
+
+    def generate(self, timeInterval, dt):
+        for i in range(int(div(timeInterval, dt).magnitude)):
+            self.calculate(dt)
+            self.save()
+        self.flush()
+
+    #========= TREES =====================================================#
+
+class Octree:
+    """Octree of the point masses of positions 'p' and masses 'm'."""
+
+    def __init__(self, p, m, depth=21):
+        checkType([depth], int)
+        self.depth = depth
+        self.origin = p.min(axis=0)
+        self.side = max((p.max(axis=0)-self.origin).max(), 1e-300)
+        keys = self.keys(p)
+        order = numpy.argsort(keys, kind="stable")
+        keys, self.p, self.m = keys[order], p[order], m[order]
+        self.start, self.count, self.mass, self.com = [], [], [], []
+        self.first, self.last = [], []
+        for level in range(depth+1):
+            ids = keys >> numpy.uint64(3*(depth-level))
+            start = numpy.flatnonzero(numpy.r_[True, ids[1:] != ids[:-1]])
+            count = numpy.diff(numpy.r_[start, len(keys)])
+            mass = numpy.add.reduceat(self.m, start)
+            com = numpy.add.reduceat(self.m[:, None]*self.p, start)
+            center = numpy.add.reduceat(self.p, start)/count[:, None]
+            single = (mass == 0) | (count == 1) # exact positions
+            com = numpy.where(single[:, None], center,
+                              com/numpy.where(mass == 0, 1, mass)[:, None])
+            if level is not 0:
+                end = numpy.r_[self.start[-1][1:], len(keys)]
+                self.first.append(numpy.searchsorted(start, self.start[-1]))
+                self.last.append(numpy.searchsorted(start, end))
+            self.start.append(start)
+            self.count.append(count)
+            self.mass.append(mass)
+            self.com.append(com)
+            if count.max() == 1:
+                break
+
+    def __len__(self):
+        return len(self.m)
+
+    def keys(self, p):
+        """Return the Morton keys of the positions 'p' in the tree box."""
+        cells = (p-self.origin)*(2**self.depth/self.side)
+        cells = numpy.clip(cells, 0, 2**self.depth-1).astype(numpy.int64)
+        return mortonKeys(cells)
+
+    def forces(self, p, m, G, theta=0.5, eps=0, kernel="plummer", group=16,
+               size=2**16):
+        """Return the gravitational forces on the masses 'm' at 'p'."""
+        return m[:, None]*self.field(p, G, theta, eps, kernel, group, size)
+
+    def field(self, p, G, theta=0.5, eps=0, kernel="plummer", group=16,
+              size=2**16):
+        """Return the gravitational field at the positions 'p'."""
+        order = numpy.argsort(self.keys(p), kind="stable")
+        pt = p[order]
+        starts = numpy.arange(0, len(pt), group)
+        low = numpy.minimum.reduceat(pt, starts)
+        high = numpy.maximum.reduceat(pt, starts)
+        center = (low+high)/2
+        radius = numpy.sqrt(((high-low)**2).sum(axis=1))/2
+
+        # walk
+        def expand(gi, first, n):
+            """Return the pairs of the groups 'gi' with the ranges."""
+            offset = numpy.repeat(numpy.cumsum(n)-n, n)
+            gi = numpy.repeat(gi, n)
+            return gi, numpy.repeat(first, n)+numpy.arange(len(gi))-offset
+        levels, accepted = len(self.mass), []
+        gi = numpy.arange(len(starts))         # group of each pair
+        node = numpy.zeros(len(gi), dtype=int) # node of each pair
+        for level in range(levels):
+            d = self.com[level][node]-center[gi]
+            d = numpy.sqrt((d*d).sum(axis=1))-radius[gi]
+            accept = self.side/2**level < theta*d
+            accept |= self.count[level][node] == 1
+            accepted.append((gi[accept], self.mass[level][node[accept]],
+                             self.com[level][node[accept]]))
+            gi, node = gi[~accept], node[~accept]
+            if len(gi) is 0:
+                break
+            if level == levels-1: # masses of the leaves
+                gi, j = expand(gi, self.start[level][node],
+                               self.count[level][node])
+                accepted.append((gi, self.m[j], self.p[j]))
+                break
+            first = self.first[level][node]
+            gi, node = expand(gi, first, self.last[level][node]-first)
+        gi = numpy.concatenate([a[0] for a in accepted])
+        order2 = numpy.argsort(gi, kind="stable")
+        gi = gi[order2]
+        sm = numpy.concatenate([a[1] for a in accepted])[order2]
+        sp = numpy.concatenate([a[2] for a in accepted])[order2]
+
+        # interactions between the targets of each group and its sources
+        padded = numpy.resize(pt, (len(starts)*group, 3))
+        padded = padded.reshape(len(starts), group, 3)
+        g = numpy.zeros(padded.shape)
+        b = max(1, size//group)
+        for k in range(0, len(gi), b):
+            gk = gi[k:k+b]
+            targets = padded[gk]
+            d = [sp[k:k+b, None, j]-targets[..., j] for j in range(3)]
+            r2 = d[0]*d[0]+d[1]*d[1]+d[2]*d[2]
+            w = G*sm[k:k+b, None]*softening(r2, eps, kernel)
+            bounds = numpy.flatnonzero(numpy.r_[True, gk[1:] != gk[:-1]])
+            for j in range(3):
+                g[gk[bounds], :, j] += numpy.add.reduceat(w*d[j], bounds)
+        result = numpy.empty((len(p), 3))
+        result[order] = g.reshape(-1, 3)[:len(p)]
+        return result
+
+    #========= ORIENTATIONS ==============================================#
+
+class QuaternionBasis(Basis):
+    """Basis of orientation the unit quaternion 'q', converted on demand."""
+
+    def __init__(self, q):
+        self.quaternion = q     # orientation
+        self._matrixBtoE = None # rotation matrix
+        self._matrixEtoB = None # transposed rotation matrix
+
+    @property
+    def matrixBtoE(self):
+        if self._matrixBtoE is None:
+            self._matrixBtoE = magQuaMat(self.quaternion)
+        return self._matrixBtoE
+
+    @property
+    def matrixEtoB(self):
+        if self._matrixEtoB is None:
+            self._matrixEtoB = Matrix(self.matrixBtoE.array.T)
+        return self._matrixEtoB
+
     #========= FUNCTIONS =================================================#
 
+def mortonKeys(cells):
+    """Return the Morton keys of the integer coordinates 'cells'."""
+    keys = numpy.zeros(len(cells), dtype=numpy.uint64)
+    for j in range(3):
+        x = cells[:, j].astype(numpy.uint64)
+        for shift, mask in [(32, 0x1f00000000ffff), (16, 0x1f0000ff0000ff),
+                            (8, 0x100f00f00f00f00f), (4, 0x10c30c30c30c30c3),
+                            (2, 0x1249249249249249)]:
+            x = (x | x << numpy.uint64(shift)) & numpy.uint64(mask)
+        keys |= x << numpy.uint64(j)
+    return keys
+
+def softening(r2, eps=0, kernel="plummer"):
+    """Return the factors replacing 1/r^3 at the squared distances 'r2':
+    - "plummer": 1/(r^2+eps^2)^(3/2)
+    - "spline": cubic spline of support 2.8*'eps'"""
+    if kernel not in ["plummer", "spline"]:
+        raise ValueError(str(kernel)+" is not a softening kernel")
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        if kernel == "plummer" or eps == 0:
+            r2 = numpy.asarray(r2+eps*eps, dtype=float)
+            w = numpy.sqrt(r2, out=numpy.empty_like(r2))
+            w *= r2
+            w[w == 0] = numpy.inf
+            return numpy.divide(1, w, out=w)
+        h = 2.8*eps
+        u = numpy.sqrt(r2)/h
+        w = numpy.where(u < 0.5, 32/3+u*u*(32*u-38.4),
+                        64/3-48*u+38.4*u*u-32/3*u**3-1/(15*u**3))
+        return numpy.where(u < 1, w/h**3, 1/(r2*numpy.sqrt(r2)))
+
+def closePairs(p, r):
+    """Return the candidate pairs (i, j), i < j, of points closer than 'r'."""
+    n = len(p)
+    if n < 2 or not r > 0:
+        return numpy.zeros(0, dtype=int), numpy.zeros(0, dtype=int)
+    with numpy.errstate(invalid="ignore"):
+        cells = numpy.nan_to_num(numpy.floor((p-p.min(axis=0))/r))
+    cells = numpy.minimum(cells, 2**20).astype(numpy.int64)+1
+    dims = cells.max(axis=0)+2
+    keys = (cells[:, 0]*dims[1]+cells[:, 1])*dims[2]+cells[:, 2]
+    order = numpy.argsort(keys, kind="stable")
+    keys = keys[order]
+    start = numpy.flatnonzero(numpy.r_[True, keys[1:] != keys[:-1]])
+    count, keys = numpy.diff(numpy.r_[start, n]), keys[start]
+    I, J = [], []
+    neighbours = numpy.indices((3, 3, 3)).reshape(3, -1).T-1
+    for offset in neighbours @ [dims[1]*dims[2], dims[2], 1]:
+        if offset < 0: # each pair of cells once
+            continue
+        b = numpy.searchsorted(keys, keys+offset)
+        match = b < len(keys)
+        match[match] = keys[b[match]] == keys[match]+offset
+        a, b = numpy.flatnonzero(match), b[match]
+        pairs = count[a]*count[b]
+        local = numpy.arange(pairs.sum())-numpy.repeat(pairs.cumsum()-pairs,
+                                                       pairs)
+        nb = numpy.repeat(count[b], pairs)
+        i = numpy.repeat(start[a], pairs)+local//nb
+        j = numpy.repeat(start[b], pairs)+local % nb
+        if offset == 0:
+            i, j = i[i < j], j[i < j]
+        I.append(order[i])
+        J.append(order[j])
+    i, j = numpy.concatenate(I), numpy.concatenate(J)
+    return numpy.minimum(i, j), numpy.maximum(i, j)
+
+def pairForces(p, m, c, sp, sm, sc, G, k, eps=0, kernel="plummer",
+               size=2**18):
+    """Return the forces exerted on the solids 'p' by the solids 'sp'."""
+    b, f = max(1, size//max(1, len(sp))), numpy.zeros((len(p), 3))
+    for i in range(0, len(p), b):
+        d = [sp[None, :, j]-p[i:i+b, j, None] for j in range(3)]
+        r2 = d[0]*d[0]+d[1]*d[1]+d[2]*d[2]
+        w = G*m[i:i+b, None]*sm[None, :]-k*c[i:i+b, None]*sc[None, :]
+        w *= softening(r2, eps, kernel)
+        for j in range(3):
+            f[i:i+b, j] = (w*d[j]).sum(axis=1)
+    return f
+
+def freeRotation(av, q, moments):
+    """Return the angular accelerations of freely rotating solids."""
+    m = magQuaMat(VectorArray(q)).array
+    w1, w2, w3 = numpy.einsum("nji,nj->in", m, av)
+    i1, i2, i3 = moments.T
+    a = numpy.stack([(i2-i3)*w2*w3/i1, (i3-i1)*w3*w1/i2,
+                     (i1-i2)*w1*w2/i3], axis=-1)
+    return numpy.einsum("nij,nj->ni", m, a)
+
+def combination(y, h, weights, k):
+    """Return 'y'+'h'*sum(weights[j]*k[j]) for each component of 'y'."""
+    result = []
+    for i in range(len(k[0])):
+        terms = [mul(h, c, k[j][i]) for j, c in enumerate(weights) if c != 0]
+        if y is not None:
+            terms.insert(0, y[i])
+        result.append(add(terms))
+    return result
+
+def rotate(w, q):
+    """Return the unit quaternions 'q' rotated by the rotation vectors 'w'."""
+    q = magQuaMul(magRotQua(Quantity(w).magnitude), q)
+    return type(q)(q.array/numpy.linalg.norm(q.array, axis=-1)[..., None])
+
+def quaternionBasis(q):
+    """Return the basis whose orientation is the unit quaternion 'q'."""
+    return QuaternionBasis(q)
+
+def orientation(basis):
+    """Return the unit quaternion of the direct orthonormal 'basis'."""
+    if isinstance(basis, QuaternionBasis):
+        return basis.quaternion
+    return magMatQua(basis.matrixBtoE)
+
+def rotationRate(w, av):
+    """Return the derivative of the rotation vector 'w'."""
+    theta = norm(w).magnitude
+    if theta < 10**-4:
+        c = 1/12
+    else:
+        c = (1-theta/2/math.tan(theta/2))/theta**2
+    u = vecPro(w, av)
+    return add(av, mul(-1/2, u), mul(c, vecPro(w, u)))
+
+def sameConfiguration(a, b):
+    """Return True if the configurations 'a' and 'b' are equal."""
+    return (numpy.array_equal(rawArray(a.position.magnitude),
+                              rawArray(b.position.magnitude)) and
+            numpy.array_equal(a.basis.matrixBtoE.array,
+                              b.basis.matrixBtoE.array))
+
+def sameState(cache, cfg, s, av):
+    """Return True if the evaluation 'cache' was made in the same state."""
+    return (sameConfiguration(cfg, cache[0]) and
+            numpy.array_equal(rawArray(s.magnitude),
+                              rawArray(cache[1].magnitude)) and
+            numpy.array_equal(rawArray(av.magnitude),
+                              rawArray(cache[2].magnitude)))
+
 def basisCreator(z):
     """Return a direct basis in which 'z' is the ordinate axis."""
     z = Quantity(z).magnitude
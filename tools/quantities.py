@@ -6,6 +6,8 @@
     #========= IMPORTS ===================================================#
 
 import string
+import functools
+import numpy
 from .vectorspace import *
 
     #========= UNITS =====================================================#
@@ -60,53 +62,85 @@ class Unit:
              ("J.K-1",   [ 1,  2, -2,  0, -1,  0,  0], "heat capacity"),
              ("K.W-1",   [-1, -2,  3,  0,  1,  0,  0], "thermal resistance")]
 
-    def __init__(self, u=None):
-        """Convert 'u' to its associated dimensional list."""
+    # indexes by dimension
+    symbols = {tuple(u[1]): u[0] for u in usual}
+    names = {tuple(u[1]): u[2] for u in reversed(base+derived+usual)}
+    weights = [(u[0], tuple(u[1]), sum([abs(c) for c in u[1]]))
+               for u in derived]
+
+    instances = {} # interned units indexed by dimension
+
+    def __new__(cls, u=None):
+        """Return the unique unit associated with 'u'."""
+
+        if isinstance(u, Unit):
+            return u
 
         if u is None:
-            self.dimension = [0, 0, 0, 0, 0, 0, 0]
-            
-        elif isinstance(u, Unit):
-            self.dimension = list(u.dimension)
+            dimension = (0, 0, 0, 0, 0, 0, 0)
 
-        elif isinstance(u, list):
-            checkSize([u], 7)
-            checkType(u, int)
-            self.dimension = list(u)
+        elif isinstance(u, (list, tuple)):
+            dimension = tuple(u)
+            if dimension not in Unit.instances:
+                checkSize([u], 7)
+                checkType(u, int)
 
         elif isinstance(u, str):
-            
-            def convert1(s):
-                for table in [Unit.base, Unit.derived, Unit.usual]:
-                    for u in table:
-                        if s == u[0]:
-                            return u[1]
-                raise ValueError(s+" is not a valid unit")
-            
-            def convert2(s):
-                if s == "":
-                    return 1
-                try:
-                    return int(s)
-                except:
-                    raise ValueError(s+" is not a valid power")
-                
-            dimension = [0, 0, 0, 0, 0, 0, 0]
-            for g in u.split("."):
-                d = convert1(g.strip("+-0123456789"))
-                p = convert2(g.strip(string.ascii_letters))
-                dimension = [dimension[i] + d[i]*p for i in range(7)]
-                
-            self.dimension =  dimension
+            dimension = Unit.parse(u)
 
         else:
             raise TypeError(str(u)+" is not a valid unit")
 
+        try:
+            return Unit.instances[dimension]
+        except KeyError:
+            unit = object.__new__(cls)
+            object.__setattr__(unit, "dimension", dimension)
+            Unit.instances[dimension] = unit
+            return unit
+
+    @staticmethod
+    @functools.lru_cache(maxsize=1024)
+    def parse(u):
+        """Convert the string 'u' to its associated dimensional tuple."""
+
+        def convert1(s):
+            for table in [Unit.base, Unit.derived, Unit.usual]:
+                for u in table:
+                    if s == u[0]:
+                        return u[1]
+            raise ValueError(s+" is not a valid unit")
+
+        def convert2(s):
+            if s == "":
+                return 1
+            try:
+                return int(s)
+            except:
+                raise ValueError(s+" is not a valid power")
+
+        dimension = [0, 0, 0, 0, 0, 0, 0]
+        for g in u.split("."):
+            d = convert1(g.strip("+-0123456789"))
+            p = convert2(g.strip(string.ascii_letters))
+            dimension = [dimension[i] + d[i]*p for i in range(7)]
+
+        return tuple(dimension)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("units are immutable")
+
+    def __reduce__(self):
+        return (Unit, (list(self.dimension),))
+
+    def __hash__(self):
+        return hash(self.dimension) # consistent with the tuples
+
     def __repr__(self):
-        return "Unit("+str(self.dimension)+")"
+        return "Unit("+str(list(self.dimension))+")"
             
     def __floordiv__(self, d):
-        checkType([d], (Unit, list))
+        checkType([d], (Unit, list, tuple))
         if isinstance(d, Unit):
             d = d.dimension
         q1, q2 = float('inf'), float('inf')
@@ -117,20 +151,22 @@ class Unit:
         return q1-q2
 
     def __str__(self):
-        """Convert the dimensional list into a string."""
+        """Return the symbol of the unit (computed once)."""
+        if "symbol" not in self.__dict__:
+            object.__setattr__(self, "symbol", self.decompose())
+        return self.symbol
+
+    def decompose(self):
+        """Convert the dimensional tuple into a string."""
 
         # search in usual units
-        for u in self.usual:
-            if self.dimension == u[1]:
-                return u[0]
+        if self.dimension in Unit.symbols:
+            return Unit.symbols[self.dimension]
 
         # decomposition into derived units
         q, w = 0, 0
-        for i in range(len(Unit.derived)):
-            s_i = Unit.derived[i][0]         # symbol
-            d_i = Unit.derived[i][1]         # dimension
+        for s_i, d_i, w_i in Unit.weights: # symbol, dimension, weight
             q_i = self//d_i                  # quotient
-            w_i = sum([abs(c) for c in d_i]) # weight
             if q_i is not 0 and w_i > w:
                 s, d, q, w = s_i, d_i, q_i, w_i
         if q is not 0:
@@ -138,8 +174,9 @@ class Unit:
                 p = ""
             else:
                 p = str(q)
-            r = str(Unit([self.dimension[i] - q*d[i] for i in range(7)]))
-            if r is "":
+            r = tuple([self.dimension[i] - q*d[i] for i in range(7)])
+            r = str(Unit(r))
+            if r == "":
                  return s+p
             return s+p+"."+r
 
@@ -154,47 +191,48 @@ class Unit:
         return ".".join(s)
 
     def __eq__(self, u):
-        checkType([u], (Unit, list))
-        if isinstance(u, list):
-            return self.dimension == u
-        return self.dimension == u.dimension
+        if isinstance(u, Unit):
+            return self is u
+        checkType([u], (list, tuple))
+        return self.dimension == tuple(u)
 
     def name(self):
-        for table in [Unit.base, Unit.derived, Unit.usual]:
-            for u in table:
-                if self.dimension == u[1]:
-                    return u[2]
-        return "unknown"
+        return Unit.names.get(self.dimension, "unknown")
 
     def dimensionString(self):
-        p, d = ["M", "L", "T", "I", "\u03F4", "N", "J"], self.dimension
-        return ".".join([p[i]+str(d[i]) for i in range(7) if d[i] is not 0])
+        if "string" not in self.__dict__:
+            p, d = ["M", "L", "T", "I", "\u03F4", "N", "J"], self.dimension
+            string = ".".join([p[i]+str(d[i]) for i in range(7) if d[i] != 0])
+            object.__setattr__(self, "string", string)
+        return self.string
 
     def copy(self):
-        return eval(repr(self))
+        return self
 
 def uniAdd(*args):
     """Verify that the units are the same and return the unit."""
-    if not all([args[0] == args[i] for i in range(1, len(args))]):
+    if Validation.skip:
+        return args[0]
+    if not all([args[0] is args[i] for i in range(1, len(args))]):
         raise UnitError("the arguments have different units")
     return args[0]
 
 def uniMul(*args):
     """Return the product unit."""
-    return Unit([sum([u.dimension[i] for u in args]) for i in range(7)])
+    return Unit(tuple([sum(d) for d in zip(*[u.dimension for u in args])]))
 
 def uniDiv(a, b):
     """Return the divided unit."""
-    return Unit([a.dimension[i] - b.dimension[i] for i in range(7)])
+    return Unit(tuple([a.dimension[i] - b.dimension[i] for i in range(7)]))
 
 def uniPwr(p):
     """Return the 'p'-th power function."""
     def aux(u):
-        d = [u.dimension[i]*p for i in range(7)]
+        d = tuple([u.dimension[i]*p for i in range(7)])
         if isinstance(p, int):
             return Unit(d)
         if isinstance(p, float):
-            q = [int(c) for c in d]
+            q = tuple([int(c) for c in d])
             if d == q:
                 return Unit(q)
         raise ValueError("invalid power "+str(p)+" for unit "+str(u))
@@ -205,7 +243,8 @@ def uniPwr(p):
 class Quantity:
     """A physical quantity is defined by a magnitude and a unit."""
 
-    magnitudes = tuple(list(Vector.scalars)+[Vector, Matrix])
+    magnitudes = tuple(list(Vector.scalars)+[Vector, Matrix]
+                       +[numpy.ndarray, VectorArray, MatrixArray])
 
     def __init__(self, magnitude, unit=None, rewriteUnit=False):
         if isinstance(magnitude, Quantity): 
@@ -260,48 +299,121 @@ class Storage:
     def __init__(self, unit=None, magType=None, data=None):
         if unit is not None:
             unit = Unit(unit)
-        if data is None:
-            data = []
-        self.unit, self.magType, self.data = unit, magType, data
+        self.unit, self.magType = unit, magType
+        self.buffer, self.size = None, 0
+        if data is not None and len(data) is not 0:
+            if isinstance(data, numpy.ndarray):
+                array = toArray(data)
+            else:
+                array = toArray(numpy.array(data))
+                if magType is Matrix:
+                    array = array.transpose(0, 2, 1)
+            self.buffer, self.size = array, len(array)
+
+    @property
+    def array(self):
+        """Return a view on the stored magnitudes."""
+        if self.buffer is None:
+            return numpy.zeros(0)
+        return self.buffer[:self.size]
+
+    @property
+    def data(self):
+        if self.magType is Matrix:
+            return self.array.transpose(0, 2, 1).tolist()
+        return self.array.tolist()
 
     def __repr__(self): 
         if self.magType is None:
             magType = "None"
+        elif self.magType is Vector.scalars:
+            magType = "Vector.scalars"
         elif isinstance(self.magType, type):
             magType = self.magType.__name__
         else:
             magType = "("+", ".join([t.__name__ for t in self.magType])+")"
-        return "Storage("+repr(self.unit)+", "+magType+", "+repr(self.data)+")"
+        if Recorder.current is not None and self.size is not 0:
+            data = "blocks["+repr(Recorder.current.id)+"]["
+            data += str(Recorder.current.block(self))+"]"
+        else:
+            data = repr(self.data)
+        return "Storage("+repr(self.unit)+", "+magType+", "+data+")"
 
     def serialize(self, value):
-        if self.magType is Vector:
-            return value.coordinates
-        if self.magType is Matrix:
-            return [v.coordinates for v in value.vectors]
+        if isinstance(value, (Vector, Matrix, VectorArray, MatrixArray)):
+            return value.array
         return value
 
     def deserialize(self, value):
         if self.magType is Vector:
-            return Vector(value)
+            if value.ndim is 2:
+                return VectorArray(value)
+            return Vector(value.copy())
         if self.magType is Matrix:
-            return Matrix([Vector(v) for v in value])
-        return value
+            if value.ndim is 3:
+                return MatrixArray(value)
+            return Matrix(value.copy())
+        if isinstance(value, numpy.ndarray):
+            return value
+        return value.item()
+
+    def reserve(self, shape, dtype, n):
+        """Make room for 'n' more magnitudes (amortized doubling)."""
+        if self.buffer is None:
+            self.buffer = numpy.empty((max(n, 16),)+shape, dtype=dtype)
+        elif self.buffer.shape[1:] != shape:
+            raise ValueError("shape "+str(shape)+" invalid, "
+                             +str(self.buffer.shape[1:])+" requested")
+        if numpy.dtype(dtype).kind == "c" and self.buffer.dtype.kind != "c":
+            self.buffer = self.buffer.astype(complex)
+        if self.size+n > len(self.buffer):
+            size = max(self.size+n, 2*len(self.buffer))
+            buffer = numpy.empty((size,)+shape, dtype=self.buffer.dtype)
+            buffer[:self.size] = self.buffer[:self.size]
+            self.buffer = buffer
 
     def add(self, value):
         value = Quantity(value)
         if self.unit is None:
-            self.unit = Unit(value.unit)
+            self.unit = value.unit
         if self.magType is None:
             self.magType = type(value.magnitude)
         checkUnit([value], self.unit)
         checkType([value.magnitude], self.magType)
-        self.data.append(self.serialize(value.magnitude))
+        row = numpy.asarray(self.serialize(value.magnitude))
+        self.reserve(row.shape, row.dtype, 1)
+        self.buffer[self.size] = row
+        self.size += 1
+
+    def extend(self, values):
+        """Add a batch of magnitudes (array, VectorArray or MatrixArray)."""
+        values = Quantity(values)
+        batches = (numpy.ndarray, VectorArray, MatrixArray)
+        checkType([values.magnitude], batches)
+        r = rank(values.magnitude)
+        if self.unit is None:
+            self.unit = values.unit
+        if self.magType is None:
+            self.magType = [float, Vector, Matrix][r]
+        checkUnit([values], self.unit)
+        if r is not {Vector: 1, Matrix: 2}.get(self.magType, 0):
+            raise TypeError("batch of rank "+str(r)+" invalid for "
+                            +str(self.magType))
+        rows = toArray(self.serialize(values.magnitude))
+        self.reserve(rows.shape[1:], rows.dtype, len(rows))
+        self.buffer[self.size:self.size+len(rows)] = rows
+        self.size += len(rows)
 
     def __len__(self):
-        return len(self.data)
+        return self.size
 
     def __getitem__(self, index):
-        return Quantity(self.deserialize(self.data[index]), self.unit)
+        return Quantity(self.deserialize(self.array[index]), self.unit)
+
+    def __setitem__(self, index, value):
+        value = Quantity(value)
+        checkUnit([value], self.unit)
+        self.array[index] = self.serialize(value.magnitude)
     
     def copy(self):
-        return eval(repr(self))
+        return Storage(self.unit, self.magType, self.array.copy())
@@ -81,8 +81,8 @@ class Rendering:
         graphic.set_ylabel(self.ordains[name])
         for i in range(len(self.trajectories)):
             t = self.trajectories[i]
-            graphic.plot([a.magnitude for a in t.data["times"]],
-                         [norm(s).magnitude for s in t.data[name]],
+            graphic.plot(t.data["times"].array,
+                         numpy.linalg.norm(t.data[name].array, axis=1),
                          color=self.settings["coloTra"][i])
 
     def normCoef(self, a):
@@ -91,7 +91,10 @@ class Rendering:
             """Recursive reading."""
             if isinstance(b, Quantity):
                 return norm(b).magnitude
-            if isinstance(b, (list, Storage)):
+            if isinstance(b, Storage):
+                return numpy.linalg.norm(b.array.reshape(len(b), -1),
+                                         axis=1).max()
+            if isinstance(b, list):
                 return max([aux(c) for c in b])
             raise TypeError("normCoef not defined on "+str(type(a)))
         m = aux(a)
@@ -106,7 +109,7 @@ class Rendering:
         if isinstance(item, Volume):
             return max(d.magnitude/2 for d in item.size)
         if isinstance(item, Path):
-            return max([norm(p).magnitude for p in item])
+            return numpy.linalg.norm(item.points.array, axis=1).max()
         else:
             raise TypeError("size not defined on "+str(type(item)))
 
@@ -122,9 +125,8 @@ class Rendering:
         else:
             nT = min([len(t.data["times"]) for t in self.trajectories])
             p = [self.size(t.solid.shp) for t in self.trajectories]
-            sT = max([max([norm(v).magnitude + p[i]
-                           for v in self.trajectories[i].data["p"]])
-                           for i in range(len(self.trajectories))])
+            sT = max([numpy.linalg.norm(t.data["p"].array, axis=1).max()+p[i]
+                      for i, t in enumerate(self.trajectories)])
         if len(self.environment) is 0:
             sE = 0
         else:
@@ -207,10 +209,8 @@ class Rendering:
             if self.settings["dispCon"]:
                 l = []
                 for k in range(self.numbFra):
-                    mBtoE = self.trajectories[i].data["mBtoE"][k]
-                    mEtoB = self.trajectories[i].data["mEtoB"][k]
+                    mBtoE = self.trajectories[i].basis(k).matrixBtoE
                     o = self.trajectories[i].data["p"][k].magnitude
-                    c = Configuration(o, Basis(mBtoE, mEtoB))
                     p = []
                     axes = [add(mul(mBtoE[0], coefSiz), o).magnitude,
                             add(mul(mBtoE[1], coefSiz), o).magnitude,
@@ -224,14 +224,10 @@ class Rendering:
 
             # paths
             if self.settings["dispPos"]:
-                l = []
+                l, positions = [], self.trajectories[i].data["p"].array
                 for k in range(self.numbFra):
-                    positions = [self.trajectories[i].data["p"][j].magnitude
-                                 for j in range(k)]
-                    x, y = numpy.array([[m[0] for m in positions],
-                                        [m[1] for m in positions]])
-                    z = numpy.array([[m[2] for m in positions],
-                                     [m[2] for m in positions]])
+                    x, y = numpy.array([positions[:k, 0], positions[:k, 1]])
+                    z = numpy.array([positions[:k, 2], positions[:k, 2]])
                     l.append([x, y, z])
                 self.dataTraPos.append(l)
 
@@ -239,9 +235,8 @@ class Rendering:
             if self.settings["dispFor"]:
                 l = []
                 for k in range(self.numbFra):
-                    f = mul(coefFor, self.trajectories[i].data["f"][k])
-                    p = self.trajectories[i].data["p"][k]
-                    f, p = f.magnitude, p.magnitude
+                    f = coefFor*self.trajectories[i].data["f"].array[k]
+                    p = self.trajectories[i].data["p"].array[k]
                     x, y = numpy.array([[p[0], p[0]+f[0]], [p[1], p[1]+f[1]]])
                     z = numpy.array([[p[2], p[2]+f[2]], [p[2], p[2]+f[2]]])
                     l.append([x, y, z])
@@ -251,9 +246,8 @@ class Rendering:
             if self.settings["dispTor"]:
                 l = []
                 for k in range(self.numbFra):
-                    t = mul(coefTor, self.trajectories[i].data["t"][k])
-                    p = self.trajectories[i].data["p"][k]
-                    t, p = t.magnitude, p.magnitude
+                    t = coefTor*self.trajectories[i].data["t"].array[k]
+                    p = self.trajectories[i].data["p"].array[k]
                     x, y = numpy.array([[p[0], p[0]+t[0]], [p[1], p[1]+t[1]]])
                     z = numpy.array([[p[2], p[2]+t[2]], [p[2], p[2]+t[2]]])
                     l.append([x, y, z])
@@ -264,33 +258,18 @@ class Rendering:
         self.dataFieVal = []
         if self.field is not None:
             if self.field.stg.magType is Vector:
-                x, y, z = numpy.meshgrid(numpy.arange(0, self.field.n[1], 1.0),
-                                         numpy.arange(0, self.field.n[0], 1.0),
-                                         numpy.arange(0, self.field.n[2], 1.0))
+                n = self.field.n
 
                 # positions
-                for i in range(len(x)):
-                    for j in range(len(x[0])):
-                        for k in range(len(x[0][0])):
-                            position = self.field.position(i, j, k)
-                            x[i][j][k] = position.magnitude[0]
-                            y[i][j][k] = position.magnitude[1]
-                            z[i][j][k] = position.magnitude[2]
-                self.dataFiePos = [x, y, z]
+                positions = self.field.positions().magnitude.array
+                positions = positions.reshape(n[0], n[1], n[2], 3)
+                self.dataFiePos = list(numpy.moveaxis(positions, -1, 0))
 
                 # values
+                samples = self.field.stg.array[:n[3]*n[0]*n[1]*n[2]]
+                samples = coefFie*samples.reshape(n[3], n[0], n[1], n[2], 3)
                 for t in range(self.numbFra):
-                    u = 0*numpy.array(x)
-                    v = 0*numpy.array(y)
-                    w = 0*numpy.array(z)
-                    for i in range(self.field.n[0]):
-                        for j in range(self.field.n[1]):
-                            for k in range(self.field.n[2]):
-                                sample = self.field.value(i, j, k, t)
-                                sample = mul(coefFie, sample)
-                                u[i][j][k] = sample.magnitude[0]
-                                v[i][j][k] = sample.magnitude[1]
-                                w[i][j][k] = sample.magnitude[2]
+                    u, v, w = numpy.moveaxis(samples[t], -1, 0)
                     self.dataFieVal.append([u, v, w])
 
         # initialization
@@ -443,6 +422,10 @@ def console(path):
                 item.animation.save(date+".mp4", writer=writer)
     menu1()
 
+def convert(path, newPath):
+    """Convert a text save to the binary format."""
+    save(newPath, eval(load(path)))
+
 class Timer:
     """Gives an estimate of the remaining calculation time."""
 
@@ -6,29 +6,370 @@
     #========= IMPORTS ===================================================#
 
 import math
+import numbers
+import numpy
 from . import *
 
+    #========= DUAL NUMBERS ==============================================#
+
+class DualError(TypeError):
+    """Operation not supported by dual numbers."""
+
+class Dual:
+    """A dual number x + x'.e with e^2 = 0 carries the derivatives of x."""
+
+    def __init__(self, val, der):
+        if isinstance(val, Dual) or isinstance(der, Dual):
+            raise DualError("nested dual numbers are not supported")
+        self.val, self.der = numpy.asarray(val), numpy.asarray(der)
+        if self.der.shape[:-1] != self.val.shape:
+            raise ValueError("invalid shape: "+str(self.der.shape))
+
+    def __repr__(self):
+        return "Dual("+repr(self.val.tolist())+", "+repr(self.der.tolist())+")"
+
+    def __str__(self):
+        return str(self.val)+"+"+str(self.der)+"e"
+
+    @property
+    def shape(self):
+        return self.val.shape
+
+    @property
+    def ndim(self):
+        return self.val.ndim
+
+    @property
+    def dtype(self):
+        return self.val.dtype
+
+    def __len__(self):
+        return len(self.val)
+
+    def __iter__(self):
+        return iter([self[i] for i in range(len(self))])
+
+    def __getitem__(self, index):
+        if not isinstance(index, tuple):
+            index = (index,)
+        if any([i is Ellipsis for i in index]):
+            return Dual(self.val[index], self.der[index+(slice(None),)])
+        return Dual(self.val[index], self.der[index])
+
+    def item(self):
+        if self.val.size != 1:
+            raise ValueError("only dual numbers of size 1 are scalars")
+        return self.reshape(())
+
+    def tolist(self):
+        if self.ndim is 0:
+            return self
+        return [a.tolist() for a in self]
+
+    def reshape(self, *shape):
+        val = self.val.reshape(*shape)
+        return Dual(val, self.der.reshape(val.shape+self.der.shape[-1:]))
+
+    def sum(self, axis=None):
+        if axis is None:
+            axis = tuple(range(self.ndim))
+        if not isinstance(axis, tuple):
+            axis = (axis,)
+        axis = tuple([a % self.ndim for a in axis])
+        return Dual(self.val.sum(axis=axis), self.der.sum(axis=axis))
+
+    def copy(self):
+        return Dual(self.val.copy(), self.der.copy())
+
+    def scalar(self):
+        raise DualError("a dual number cannot be converted to a scalar")
+
+    __float__ = __complex__ = __int__ = __index__ = scalar
+
+    def __array__(self, *args, **kwargs):
+        raise DualError("a dual number cannot be converted to an array")
+
+    def __bool__(self):
+        return bool(self.val)
+
+    @staticmethod
+    def new(val, der):
+        """Return the dual number of values 'val' and derivatives 'der'."""
+        d = object.__new__(Dual)
+        d.val, d.der = val, der
+        if der.shape[:-1] != numpy.shape(val):
+            d.der = numpy.broadcast_to(der, numpy.shape(val)+der.shape[-1:])
+        return d
+
+    def __add__(self, b):
+        if isinstance(b, Dual):
+            return Dual.new(self.val+b.val, self.der+b.der)
+        return Dual.new(self.val+b, self.der)
+
+    __radd__ = __add__
+
+    def __sub__(self, b):
+        if isinstance(b, Dual):
+            return Dual.new(self.val-b.val, self.der-b.der)
+        return Dual.new(self.val-b, self.der)
+
+    def __rsub__(self, a):
+        return Dual.new(a-self.val, -self.der)
+
+    def __mul__(self, b):
+        if isinstance(b, Dual):
+            return Dual.new(self.val*b.val, self.der*b.val[..., None]
+                                            +self.val[..., None]*b.der)
+        return Dual.new(self.val*b, self.der*numpy.asarray(b)[..., None])
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, b):
+        if isinstance(b, Dual):
+            f = self.val/b.val
+            der = (self.der-f[..., None]*b.der)/b.val[..., None]
+            return Dual.new(f, der)
+        return Dual.new(self.val/b, self.der/numpy.asarray(b)[..., None])
+
+    def __rtruediv__(self, a):
+        f = a/self.val
+        return Dual.new(f, -(f/self.val)[..., None]*self.der)
+
+    def __pow__(self, b):
+        if isinstance(b, Dual):
+            return numpy.power(self, b)
+        f = self.val**b
+        return Dual.new(f, (b*self.val**(b-1))[..., None]*self.der)
+
+    def __mod__(self, b):
+        return numpy.remainder(self, b)
+
+    def __rpow__(self, a):
+        return numpy.power(a, self)
+
+    def __matmul__(self, b):
+        return numpy.matmul(self, b)
+
+    def __rmatmul__(self, a):
+        return numpy.matmul(a, self)
+
+    def __neg__(self):
+        return Dual.new(-self.val, -self.der)
+
+    def __pos__(self):
+        return self
+
+    def __abs__(self):
+        return numpy.absolute(self)
+
+    def __eq__(self, b):
+        return numpy.equal(self, b)
+
+    def __ne__(self, b):
+        return numpy.not_equal(self, b)
+
+    def __lt__(self, b):
+        return numpy.less(self, b)
+
+    def __le__(self, b):
+        return numpy.less_equal(self, b)
+
+    def __gt__(self, b):
+        return numpy.greater(self, b)
+
+    def __ge__(self, b):
+        return numpy.greater_equal(self, b)
+
+
+    __hash__ = None
+
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        if method == "reduce" and ufunc is numpy.add and "out" not in kwargs:
+            return inputs[0].sum(kwargs.get("axis", 0))
+        if method != "__call__" or kwargs:
+            raise DualError(ufunc.__name__+"."+method+" is not supported")
+        x, d, k = Dual.split(inputs)
+        if ufunc in Dual.values:
+            return ufunc(*x)
+        if ufunc is numpy.matmul:
+            f = x[0] @ x[1]
+            der = [sum([t for t in [d[0][..., j] @ x[1] if d[0] is not None
+                                    else None,
+                                    x[0] @ d[1][..., j] if d[1] is not None
+                                    else None] if t is not None])
+                   for j in range(k)]
+            return Dual(f, numpy.stack(der, axis=-1))
+        if ufunc not in Dual.rules:
+            raise DualError(ufunc.__name__+" has no derivative rule")
+        f = ufunc(*x)
+        der, shape = Dual.rules[ufunc](x, d, f), numpy.shape(f)+(k,)
+        if numpy.shape(der) != shape:
+            der = numpy.broadcast_to(der, shape)
+        return Dual(f, der)
+
+    def __array_function__(self, func, types, args, kwargs):
+        if func not in Dual.functions:
+            raise DualError(func.__name__+" is not supported")
+        return Dual.functions[func](*args, **kwargs)
+
+    @staticmethod
+    def split(args):
+        """Return the values, derivatives and directions of the 'args'."""
+        x, d, k = [], [], None
+        for a in args:
+            if isinstance(a, Dual):
+                x.append(a.val)
+                d.append(a.der)
+                k = a.der.shape[-1]
+            else:
+                x.append(a)
+                d.append(None)
+        return x, d, k
+
+    @staticmethod
+    def comb(*terms):
+        """Return the sum of the products c * d of the pairs in 'terms'."""
+        der = None
+        for c, d in terms:
+            if d is not None:
+                t = d if c is 1 else numpy.asarray(c)[..., None]*d
+                der = t if der is None else der+t
+        return der
+
+    @staticmethod
+    def safe(f, g):
+        """Return 'g'('f') where 'f' is not zero and zero elsewhere."""
+        f = numpy.asarray(f)
+        return numpy.where(f == 0, 0, g(numpy.where(f == 0, 1, f)))
+
+    @staticmethod
+    def power(x, d, f):
+        der = Dual.comb((x[1]*x[0]**(x[1]-1), d[0]))
+        if d[1] is not None:
+            der = der+Dual.comb((numpy.log(x[0])*f, d[1]))
+        return der
+
+    @staticmethod
+    def arctan2(x, d, f):
+        n = x[0]*x[0]+x[1]*x[1]
+        return Dual.comb((x[1]/n, d[0]), (-x[0]/n, d[1]))
+
+    @staticmethod
+    def absolute(x, d, f):
+        n = Dual.safe(f, lambda f: 1/f)
+        return numpy.real(numpy.conj(numpy.asarray(x[0])*n)[..., None]*d[0])
+
+    @staticmethod
+    def where(c, a, b):
+        (x, y), (d, e), k = Dual.split([a, b])
+        f = numpy.where(c, x, y)
+        c = numpy.asarray(c)[..., None]
+        der = numpy.where(c, 0 if d is None else d, 0 if e is None else e)
+        return Dual(f, numpy.broadcast_to(der, f.shape+(k,)))
+
+    @staticmethod
+    def cross(a, b):
+        a0, a1, a2 = a[..., 0], a[..., 1], a[..., 2]
+        b0, b1, b2 = b[..., 0], b[..., 1], b[..., 2]
+        return numpy.stack([a1*b2-a2*b1, a2*b0-a0*b2, a0*b1-a1*b0], axis=-1)
+
+    @staticmethod
+    def join(join, args, axis):
+        """Join the dual numbers 'args' with 'join' along 'axis'."""
+        x, d, k = Dual.split(args)
+        f = join(x, axis=axis)
+        axis = axis % f.ndim
+        d = [numpy.zeros(numpy.shape(x[i])+(k,)) if d[i] is None else d[i]
+             for i in range(len(args))]
+        return Dual(f, join(d, axis=axis))
+
+    rules = {
+        numpy.add: lambda x, d, f: Dual.comb((1, d[0]), (1, d[1])),
+        numpy.subtract: lambda x, d, f: Dual.comb((1, d[0]), (-1, d[1])),
+        numpy.multiply: lambda x, d, f: Dual.comb((x[1], d[0]), (x[0], d[1])),
+        numpy.divide: lambda x, d, f: Dual.comb((1/numpy.asarray(x[1]), d[0]),
+                                                (-f/x[1], d[1])),
+        numpy.negative: lambda x, d, f: -d[0],
+        numpy.power: power.__func__,
+        numpy.square: lambda x, d, f: Dual.comb((2*x[0], d[0])),
+        numpy.sqrt: lambda x, d, f: Dual.comb((Dual.safe(f, lambda f: 1/(2*f)),
+                                               d[0])),
+        numpy.exp: lambda x, d, f: Dual.comb((f, d[0])),
+        numpy.log: lambda x, d, f: Dual.comb((1/x[0], d[0])),
+        numpy.sin: lambda x, d, f: Dual.comb((numpy.cos(x[0]), d[0])),
+        numpy.cos: lambda x, d, f: Dual.comb((-numpy.sin(x[0]), d[0])),
+        numpy.tan: lambda x, d, f: Dual.comb((1+f*f, d[0])),
+        numpy.arctan: lambda x, d, f: Dual.comb((1/(1+x[0]*x[0]), d[0])),
+        numpy.arctan2: arctan2.__func__,
+        numpy.remainder: lambda x, d, f: Dual.comb((1, d[0])),
+        numpy.absolute: absolute.__func__,
+        numpy.conjugate: lambda x, d, f: numpy.conj(d[0])}
+
+    values = (numpy.equal, numpy.not_equal, numpy.less, numpy.less_equal,
+              numpy.greater, numpy.greater_equal, numpy.isfinite, numpy.isnan,
+              numpy.isinf, numpy.sign, numpy.floor)
+
+    functions = {
+        numpy.where: where.__func__,
+        numpy.cross: cross.__func__,
+        numpy.sum: lambda a, axis=None: a.sum(axis),
+        numpy.shape: lambda a: a.shape,
+        numpy.ndim: lambda a: a.ndim,
+        numpy.concatenate: lambda a, axis=0: Dual.join(numpy.concatenate, a,
+                                                       axis),
+        numpy.stack: lambda a, axis=0: Dual.join(numpy.stack, a, axis)}
+
     #========= VECTORS ===================================================#
+
+def toArray(args):
+    """Return a float64 (or complex128) array holding the scalars 'args'."""
+    if isinstance(args, Dual):
+        return args
+    if isinstance(args, numpy.ndarray):
+        if args.dtype.kind == "c":
+            return numpy.asarray(args, dtype=complex)
+        return numpy.asarray(args, dtype=float)
+    checkType(args, Vector.scalars)
+    for c in args:
+        if isinstance(c, Dual):
+            return numpy.stack(args)
+        if isinstance(c, complex):
+            return numpy.array(args, dtype=complex)
+    return numpy.array(args, dtype=float)
         
 class Vector:
     """A vector is defined by a sequence of scalars."""
 
-    scalars = (int, float, complex)
+    scalars = (int, float, complex, numpy.number, Dual)
 
     def __init__(self, *args):
-        args = arguments(args)
-        checkType(args, Vector.scalars)
-        self.coordinates = list(args)
+        if len(args) is 1 and isinstance(args[0], (numpy.ndarray, Dual)):
+            self.array = toArray(args[0])
+        else:
+            self.array = toArray(arguments(args))
+        if self.array.ndim != 1:
+            raise ValueError("invalid dimension: "+str(self.array.ndim))
+
+    @property
+    def coordinates(self):
+        return self.array.tolist()
 
     def __len__(self):
-        return len(self.coordinates)
+        return len(self.array)
+
+    def __iter__(self):
+        return iter(self.array.tolist())
 
     def __getitem__(self, index):
-        return self.coordinates[index]
+        if isinstance(index, slice):
+            return self.array[index].tolist()
+        return self.array[index].item()
 
     def __setitem__(self, index, value):
         checkType([value], Vector.scalars)
-        self.coordinates[index] = value
+        if isinstance(value, complex) and self.array.dtype.kind != "c":
+            self.array = self.array.astype(complex)
+        self.array[index] = value
 
     def __repr__(self):
         return "Vector("+", ".join([repr(c) for c in self])+")"
@@ -39,10 +380,10 @@ class Vector:
 
     def __eq__(self, vector):
         checkType([vector], Vector)
-        return self.coordinates == vector.coordinates
+        return numpy.array_equal(self.array, vector.array)
 
     def copy(self):
-        return eval(repr(self))
+        return Vector(self.array.copy())
 
     #========= MATRICES ==================================================#
 
@@ -50,21 +391,37 @@ class Matrix:
     """A matrix is defined by a sequence of column vectors."""
 
     def __init__(self, *args):
-        args = arguments(args)
-        checkType(args, Vector)
-        checkSize(args, len(args))
-        self.vectors = [v for v in args]
+        if len(args) is 1 and isinstance(args[0], (numpy.ndarray, Dual)):
+            self.array = toArray(args[0])
+        else:
+            args = arguments(args)
+            checkType(args, Vector)
+            checkSize(args, len(args))
+            self.array = toArray(numpy.column_stack([v.array for v in args]))
+        if self.array.ndim != 2 or self.array.shape[0] != self.array.shape[1]:
+            raise ValueError("invalid shape: "+str(self.array.shape))
+
+    @property
+    def vectors(self):
+        return [Vector(self.array[:, j]) for j in range(len(self))]
 
     def __len__(self):
-        return len(self.vectors)
+        return len(self.array)
+
+    def __iter__(self):
+        return iter(self.vectors)
 
     def __getitem__(self, index):
-        return self.vectors[index]
+        if isinstance(index, slice):
+            return self.vectors[index]
+        return Vector(self.array[:, index])
 
     def __setitem__(self, index, value):
-        checkType(value, Vector)
-        checkSize(value, len(self))
-        self.vectors[index] = value
+        checkType([value], Vector)
+        checkSize([value], len(self))
+        if value.array.dtype.kind == "c" and self.array.dtype.kind != "c":
+            self.array = self.array.astype(complex)
+        self.array[:, index] = value.array
 
     def __repr__(self):
         return "Matrix("+", ".join([repr(v) for v in self])+")"
@@ -77,70 +434,269 @@ class Matrix:
         return "\n".join(["|"+" ".join(line)+"|" for line in p])
 
     def __eq__(self, matrix):
-        checkType(matrix, Matrix)
-        return self.vectors == matrix.vectors
+        checkType([matrix], Matrix)
+        return numpy.array_equal(self.array, matrix.array)
 
     def copy(self):
-        return eval(repr(self))
+        return Matrix(self.array.copy())
+
+    #========= ARRAYS ====================================================#
+
+class VectorArray:
+    """A vector array is defined by a sequence of vectors."""
+
+    def __init__(self, *args):
+        if len(args) is 1 and isinstance(args[0], (numpy.ndarray, Dual)):
+            self.array = toArray(args[0])
+        else:
+            args = arguments(args)
+            checkType(args, Vector)
+            checkSize(args)
+            self.array = toArray(numpy.array([v.array for v in args]))
+        if self.array.ndim != 2:
+            raise ValueError("invalid shape: "+str(self.array.shape))
+
+    def __len__(self):
+        return len(self.array)
+
+    def __iter__(self):
+        return iter([Vector(a) for a in self.array])
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, numpy.integer)):
+            return Vector(self.array[index])
+        return VectorArray(self.array[index])
+
+    def __setitem__(self, index, value):
+        checkType([value], (Vector, VectorArray))
+        self.array[index] = value.array
+
+    def __repr__(self):
+        return "VectorArray("+", ".join([repr(v) for v in self])+")"
+
+    def __str__(self):
+        return "\n".join([str(v.coordinates) for v in self])
+
+    def __eq__(self, vectors):
+        checkType([vectors], VectorArray)
+        return numpy.array_equal(self.array, vectors.array)
+
+    def copy(self):
+        return VectorArray(self.array.copy())
+
+class MatrixArray:
+    """A matrix array is defined by a sequence of matrices."""
+
+    def __init__(self, *args):
+        if len(args) is 1 and isinstance(args[0], (numpy.ndarray, Dual)):
+            self.array = toArray(args[0])
+        else:
+            args = arguments(args)
+            checkType(args, Matrix)
+            checkSize(args)
+            self.array = toArray(numpy.array([m.array for m in args]))
+        if self.array.ndim != 3 or self.array.shape[1] != self.array.shape[2]:
+            raise ValueError("invalid shape: "+str(self.array.shape))
+
+    def __len__(self):
+        return len(self.array)
+
+    def __iter__(self):
+        return iter([Matrix(a) for a in self.array])
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, numpy.integer)):
+            return Matrix(self.array[index])
+        return MatrixArray(self.array[index])
+
+    def __setitem__(self, index, value):
+        checkType([value], (Matrix, MatrixArray))
+        self.array[index] = value.array
+
+    def __repr__(self):
+        return "MatrixArray("+", ".join([repr(m) for m in self])+")"
+
+    def __str__(self):
+        return "\n\n".join([str(m) for m in self])
+
+    def __eq__(self, matrices):
+        checkType([matrices], MatrixArray)
+        return numpy.array_equal(self.array, matrices.array)
+
+    def copy(self):
+        return MatrixArray(self.array.copy())
+
+def isBatch(*args):
+    """Return True if an item of 'args' is an array of scalars or tensors."""
+    batches = (numpy.ndarray, VectorArray, MatrixArray)
+    return any([isinstance(a, batches) or isinstance(a, Dual) and a.ndim
+                for a in args])
+
+def rank(a):
+    """Return the rank of 'a' (0: scalar, 1: vector, 2: matrix)."""
+    if isinstance(a, Vector.scalars):
+        return 0
+    if isinstance(a, numpy.ndarray) and a.ndim is 1:
+        return 0
+    if isinstance(a, (Vector, VectorArray)):
+        return 1
+    if isinstance(a, (Matrix, MatrixArray)):
+        return 2
+    raise TypeError(str(type(a))+" is not a valid magnitude")
+
+def rawArray(a, r=0):
+    """Return the array of 'a' with 'r' trailing axes added to scalars."""
+    if isinstance(a, (numpy.ndarray, Dual)):
+        return a.reshape(a.shape+(1,)*r)
+    if isinstance(a, Vector.scalars):
+        return a
+    return a.array
+
+def fromArray(array, r):
+    """Return the batch of rank 'r' stored in 'array'."""
+    if r is 0:
+        return toArray(array)
+    if r is 1:
+        return VectorArray(array)
+    return MatrixArray(array)
+
+def checkRank(args, r=None):
+    """Check the rank of the items in 'args'."""
+    ranks = [rank(a) for a in args]
+    if r is None:
+        r = ranks[0]
+    for i in range(len(args)):
+        if ranks[i] is not r:
+            raise TypeError("rank "+str(ranks[i])+" invalid, "
+                            +str(r)+" requested")
+    return r
+
+    #========= LU DECOMPOSITION ==========================================#
+
+class LU:
+    """LU decomposition with partial pivoting of a square matrix 'm'."""
+
+    def __init__(self, m):
+        checkType([m], Matrix)
+        lu, n = m.copy(), len(m)
+        self.perm, self.sign = list(range(n)), 1
+        scale = numpy.abs(lu.array).max() if n is not 0 else 0
+        self.tol = n*numpy.finfo(float).eps*scale # zero pivot
+        for j in range(n):
+            i = pivot(j, lu)
+            if i != j:
+                rowSwi(i, j, lu)
+                self.perm[i], self.perm[j] = self.perm[j], self.perm[i]
+                self.sign = -self.sign
+            a = lu.array
+            if abs(a[j, j]) > self.tol:
+                a[j+1:, j] /= a[j, j]
+                a[j+1:, j+1:] -= numpy.outer(a[j+1:, j], a[j, j+1:])
+        self.lu = lu
+
+    def __len__(self):
+        return len(self.lu)
+
+    def singular(self):
+        """Return True if a pivot is zero (relatively to 'self.tol')."""
+        return bool(numpy.any(numpy.abs(numpy.diagonal(self.lu.array))
+                              <= self.tol))
+
+    def det(self):
+        """Return the determinant of the decomposed matrix."""
+        if self.singular():
+            return 0.
+        return (self.sign*numpy.prod(numpy.diagonal(self.lu.array))).item()
+
+    def solve(self, b):
+        """Return 'x' such that m * 'x' = 'b' ('b' vector or matrix)."""
+        checkType([b], (Vector, Matrix))
+        checkSize([self, b])
+        a = self.lu.array
+        x = b.array[self.perm].astype(numpy.result_type(a, b.array))
+        for i in range(1, len(a)):
+            x[i] -= a[i, :i] @ x[:i]
+        for i in reversed(range(len(a))):
+            x[i] = (x[i] - a[i, i+1:] @ x[i+1:])/a[i, i]
+        return type(b)(x)
+
+    def inverse(self):
+        """Return the inverse of the decomposed matrix."""
+        n = len(self)
+        return self.solve(Matrix(numpy.identity(n, dtype=self.lu.array.dtype)))
 
     #========= MAGNITUDE FUNCTIONS =======================================#
 
 def magAdd(*args):
     """Return the sum of the elements in 'args'."""
     args = arguments(args)
+    if isBatch(*args):
+        r = checkRank(args)
+        array = rawArray(args[0])
+        for a in args[1:]:
+            array = array+rawArray(a)
+        return fromArray(array, r)
     if isinstance(args[0], Vector.scalars):
         checkType(args, Vector.scalars)
         return sum(args)
     argType = checkType(args)
-    if argType is Vector:
-        argSize = checkSize(args)
-        return Vector([sum([c[i] for c in args]) for i in range(argSize)])
-    if argType is Matrix:
-        argSize = checkSize(args)
-        return Matrix([magAdd([c[i] for c in args]) for i in range(argSize)])
+    if argType in (Vector, Matrix):
+        checkSize(args)
+        array = args[0].array
+        for a in args[1:]:
+            array = array+a.array
+        return argType(array)
     raise TypeError("addition not defined for "+str(argType))
 
 def magSub(a, b):
     """Return the difference of 'a' and 'b'."""
+    if isBatch(a, b):
+        return fromArray(rawArray(a)-rawArray(b), checkRank([a, b]))
     if isinstance(a, Vector.scalars):
         checkType([b], Vector.scalars)
         return a-b
     argType = checkType([a, b])
-    if argType is Vector:
-        argSize = checkSize([a, b])
-        return Vector([a[j]-b[j] for j in range(argSize)])
-    if argType is Matrix:
-        argSize = checkSize([a, b])
-        return Matrix([magSub(a[j], b[j]) for j in range(argSize)])
+    if argType in (Vector, Matrix):
+        checkSize([a, b])
+        return argType(a.array-b.array)
     raise TypeError("substraction not defined for "+str(argType))
 
 def auxMul(a, b):
     """Return the product of 'a' and 'b'."""
+    if isBatch(a, b):
+        return batMul(a, b)
     if isinstance(a, Vector.scalars):
         if isinstance(b, Vector.scalars):
             return a*b
-        if isinstance(b, Vector):
-            return Vector([a*c for c in b])
-        if isinstance(b, Matrix):
-            return Matrix([auxMul(a, v) for v in b])
+        if isinstance(b, (Vector, Matrix)):
+            return type(b)(a*b.array)
     if isinstance(a, Vector) and isinstance(b, Vector.scalars):
-        return Vector([b*c for c in a])
+        return Vector(b*a.array)
     if isinstance(a, Matrix):
         if isinstance(b, Vector.scalars):
-            return Matrix([auxMul(b, v) for v in a])
+            return Matrix(b*a.array)
         if isinstance(b, Vector):
-            if len(a) is not len(b):
+            if len(a) != len(b):
                 raise ValueError(str(len(a))+"-dimensional matrix * "+
                                  str(len(b))+"-dimensional vector invalid")
-            coordinates = [sum([a[j][i]*b[j] for j in range(len(a))])
-                                             for i in range(len(a))]
-            return Vector(coordinates)
+            return Vector(a.array @ b.array)
         if isinstance(b, Matrix):
-            if len(a) is not len(b):
+            if len(a) != len(b):
                 raise ValueError(str(len(a))+"-dimensional matrix * "+
                                  str(len(b))+"-dimensional matrix invalid")
-            vectors = [auxMul(a, v) for v in b]
-            return Matrix(vectors)
+            return Matrix(a.array @ b.array)
+    raise TypeError(str(type(a))+" * "+str(type(b))+" multiplication invalid")
+
+def batMul(a, b):
+    """Return the product of 'a' and 'b' when one of them is a batch."""
+    ra, rb = rank(a), rank(b)
+    if ra is 0 or rb is 0:
+        return fromArray(rawArray(a, rb)*rawArray(b, ra), max(ra, rb))
+    if ra is 2 and rb is 1:
+        array = numpy.matmul(rawArray(a), rawArray(b)[..., None])[..., 0]
+        return fromArray(array, 1)
+    if ra is 2 and rb is 2:
+        return fromArray(numpy.matmul(rawArray(a), rawArray(b)), 2)
     raise TypeError(str(type(a))+" * "+str(type(b))+" multiplication invalid")
 
 def magMul(*args):
@@ -154,6 +710,9 @@ def magMul(*args):
 
 def magDiv(a, b):
     """Return the division of 'a' by 'b'."""
+    if isinstance(b, numpy.ndarray):
+        checkRank([b], 0)
+        return auxMul(a, 1/b)
     checkType([b], Vector.scalars)
     return auxMul(a, 1/b)
 
@@ -162,10 +721,20 @@ def magPwr(p):
     def aux(a):
         if isinstance(a, Vector.scalars):
             return a**p
-        if isinstance(a, Matrix) and isinstance(p, int) and p >= 0:
-            if p is 0:
-                return identity(len(a))
-            return magMul([a for i in range(p)])
+        if isinstance(a, numpy.ndarray) and a.ndim is 1:
+            return a**p
+        if isinstance(a, Matrix) and isinstance(p, numbers.Integral):
+            if p < 0:
+                a = magInv(a)
+            q, b = abs(p), a.array
+            m = numpy.identity(len(a), dtype=b.dtype)
+            while q:
+                if q & 1:
+                    m = m @ b
+                q >>= 1
+                if q:
+                    b = b @ b
+            return Matrix(m)
         raise TypeError("power "+str(p)+" not defined for "+str(type(a)))
     return aux
 
@@ -176,28 +745,64 @@ def magLog(b=math.e):
         return math.log(a, b)
     return aux
 
-def magExp(a, n=1000):
+def magExp(a, tol=1e-16):
     """Return the exponential of 'a'."""
     if isinstance(a, Vector.scalars):
         return math.exp(a)
     if isinstance(a, Matrix):
-        p = [magDiv(magPwr(k)(a), math.factorial(k)) for k in range(n)]
-        return magAdd(p)
+        m = a.array
+        if len(m) is 3 and m.dtype.kind != "c" and numpy.array_equal(m, -m.T):
+            return magRotMat(Vector(m[2, 1], m[0, 2], m[1, 0]))
+
+        # Scaling
+        n = numpy.abs(m).sum(axis=1).max()
+        j = max(0, 1+math.floor(math.log2(n))) if n > 0 else 0
+        m = m/2**j
+
+        # Pade approximation
+        q = 1
+        while (2**(3-2*q)*math.factorial(q)**2 > tol*math.factorial(2*q)
+                                              *math.factorial(2*q+1)):
+            q += 1
+        N = numpy.identity(len(m), dtype=m.dtype)
+        D, X, c = N.copy(), N.copy(), 1
+        for k in range(1, q+1):
+            c = c*(q-k+1)/((2*q-k+1)*k)
+            X = m @ X
+            N += c*X
+            D += (-1)**k*c*X
+        f = LU(Matrix(D)).solve(Matrix(N)).array
+
+        # Squaring
+        for k in range(j):
+            f = f @ f
+        return Matrix(f)
     raise TypeError("exponential not defined for "+str(type(a)))
 
 def magScaPro(a, b):
     """Return the scalar product of 'a' and 'b'."""
+    if isBatch(a, b):
+        checkRank([a, b], 1)
+        return toArray((rawArray(a)*rawArray(b)).sum(axis=-1))
     checkType([a, b], Vector)
-    argSize = checkSize([a, b])
-    return sum([a[i]*b[i] for i in range(argSize)])
+    checkSize([a, b])
+    return (a.array @ b.array).item()
 
 def magVecPro(a, b):
     """Return the vector product of 'a' and 'b' in dimension 3."""
+    if isBatch(a, b):
+        checkRank([a, b], 1)
+        a, b = rawArray(a), rawArray(b)
+        if a.shape[-1] != 3 or b.shape[-1] != 3:
+            raise ValueError("vector product only defined in dimension 3")
+        return VectorArray(numpy.cross(a, b))
     checkType([a, b], Vector)
     checkSize([a, b], 3)
-    x = a[1]*b[2] - a[2]*b[1]
-    y = a[2]*b[0] - a[0]*b[2]
-    z = a[0]*b[1] - a[1]*b[0]
+    a0, a1, a2 = a.array.tolist()
+    b0, b1, b2 = b.array.tolist()
+    x = a1*b2 - a2*b1
+    y = a2*b0 - a0*b2
+    z = a0*b1 - a1*b0
     return Vector(x, y, z)
 
 def magNorm(p=2):
@@ -205,8 +810,18 @@ def magNorm(p=2):
     def aux(a):
         if isinstance(a, Vector.scalars):
             return abs(a)
+        if isinstance(a, numpy.ndarray):
+            checkRank([a], 0)
+            return abs(a)
+        if isinstance(a, VectorArray):
+            if p == 2:
+                return numpy.sqrt((abs(a.array)**2).sum(axis=-1))
+            return (abs(a.array)**p).sum(axis=-1)**(1/p)
         if isinstance(a, Vector):
-            return sum([abs(c)**p for c in a])**(1/p)
+            if p == 2:
+                n = (abs(a.array) @ abs(a.array)).item()
+                return numpy.sqrt(n) if isinstance(n, Dual) else math.sqrt(n)
+            return ((abs(a.array)**p).sum()**(1/p)).item()
         raise TypeError("norm "+str(p)+" not defined for "+str(type(a)))
     return aux
 
@@ -217,79 +832,55 @@ def submatrix(iCut, jCut, m):
     return Matrix([Vector(coordinates) for coordinates in p])
 
 def magDet(m):
-    """Return the determinant of 'm' using recursion."""
-    checkType([m], Matrix)
-    if len(m) is 1:
-        return m[0][0]
-    p = [((-1)**j)*m[j][0]*magDet(submatrix(0, j, m)) for j in range(len(m))]
-    return sum(p)
+    """Return the determinant of 'm' using LU decomposition."""
+    return LU(m).det()
 
 def identity(n):
     """Return the identity matrix of size 'n'."""
-    p = [[1 if i is j else 0 for i in range(n)] for j in range(n)]
-    return Matrix([Vector(coordinates) for coordinates in p])
+    return Matrix(numpy.identity(n))
 
 def rowSwi(i, j, m):
     """Apply the elementary operation R'i' <-> R'j' to 'm'."""
-    for k in range(len(m)):
-        m[k][i], m[k][j] = m[k][j], m[k][i]
+    m.array[[i, j]] = m.array[[j, i]]
 
 def rowMul(i, k, m):
     """Apply the elementary operation 'k' * R'i' -> R'i' to 'm'."""
     if k == 0:
         raise ValueError("'k' is zero")
-    for j in range(len(m)):
-        m[j][i] = k*m[j][i]
+    m.array[i] *= k
 
 def rowAdd(i, k, j, m):
     """Apply the elementary operation R'i' + 'k' * R'j' -> R'i' to 'm'."""
     if i is j:
         raise ValueError("'i' = 'j'")
-    for p in range(len(m)):
-        m[p][i] += k*m[p][j]
+    m.array[i] += k*m.array[j]
         
 def pivot(j, m):
     """Return a pivot for the 'j'th column of 'm'."""
-    row, absMax = j, abs(m[j][j])
-    for i in range(j+1, len(m)):
-        if abs(m[j][i]) > absMax:
-            row, absMax = i, abs(m[j][i])
-    return row
+    return j+int(numpy.argmax(abs(m.array[j:, j])))
 
 def magInv(m, checkDet=True):
-    """Return the inverse of 'm' using Gaussian elimination."""
+    """Return the inverse of 'm' using LU decomposition."""
     if isinstance(m, Vector.scalars):
         return 1/m
     if not isinstance(m, Matrix):
         raise TypeError("inverse not defined for "+str(type(m)))
-    if checkDet and magDet(m) == 0:
+    f = LU(m)
+    if checkDet and f.singular():
         raise ValueError("the determinant of the matrix is zero")
+    return f.inverse()
 
-    auxMatrix = m.copy()
-    invMatrix = identity(len(m))
-    for j in range(len(m)):
-
-        # Switching
-        i = pivot(j, auxMatrix)
-        rowSwi(i, j, auxMatrix)
-        rowSwi(i, j, invMatrix)
-
-        # Multiplication
-        k = 1/auxMatrix[j][j]
-        rowMul(j, k, auxMatrix)
-        rowMul(j, k, invMatrix)
-
-        # Addition
-        for i in range(len(m)):
-            if i is not j:
-                k = -auxMatrix[j][i]
-                rowAdd(i, k, j, auxMatrix)
-                rowAdd(i, k, j, invMatrix)
-                
-    return invMatrix
+def magSolve(m, b):
+    """Return the solution 'x' of the linear system 'm' * 'x' = 'b'."""
+    f = LU(m)
+    if f.singular():
+        raise ValueError("the determinant of the matrix is zero")
+    return f.solve(b)
 
 def magRotMat(v):
     """Return the rotation matrix associated with the rotation vector 'v'."""
+    if isinstance(v, VectorArray):
+        return batRotMat(v)
     checkType([v], Vector)
     checkSize([v], 3)
     
@@ -301,11 +892,92 @@ def magRotMat(v):
     x, y, z = u[0], u[1], u[2]
     c, s = math.cos(theta), math.sin(theta)
     
-    r1 = Vector(x*x*(1-c)+c, x*y*(1-c)+z*s, x*z*(1-c)-y*s)
-    r2 = Vector(x*y*(1-c)-z*s, y*y*(1-c)+c, y*z*(1-c)+x*s)
-    r3 = Vector(x*z*(1-c)+y*s, y*z*(1-c)-x*s, z*z*(1-c)+c)
+    r1 = [x*x*(1-c)+c, x*y*(1-c)+z*s, x*z*(1-c)-y*s]
+    r2 = [x*y*(1-c)-z*s, y*y*(1-c)+c, y*z*(1-c)+x*s]
+    r3 = [x*z*(1-c)+y*s, y*z*(1-c)-x*s, z*z*(1-c)+c]
     
-    return Matrix(r1, r2, r3)
+    return Matrix(numpy.array([r1, r2, r3]).T)
+
+def batRotMat(v):
+    """Return the rotation matrices associated with the rotation vectors."""
+    checkType([v], VectorArray)
+    if v.array.shape[1] != 3:
+        raise ValueError("rotation vectors must be of size 3")
+
+    theta = magNorm(2)(v)
+    u = v.array/numpy.where(theta == 0, 1, theta)[:, None]
+    x, y, z = u.T
+    c, s = numpy.cos(theta), numpy.sin(theta)
+
+    r1 = numpy.stack([x*x*(1-c)+c, x*y*(1-c)+z*s, x*z*(1-c)-y*s], axis=-1)
+    r2 = numpy.stack([x*y*(1-c)-z*s, y*y*(1-c)+c, y*z*(1-c)+x*s], axis=-1)
+    r3 = numpy.stack([x*z*(1-c)+y*s, y*z*(1-c)-x*s, z*z*(1-c)+c], axis=-1)
+
+    return MatrixArray(numpy.stack([r1, r2, r3], axis=-1))
+
+def magRotQua(v):
+    """Return the unit quaternions associated with the rotation vectors."""
+    checkType([v], (Vector, VectorArray))
+    if v.array.shape[-1] != 3:
+        raise ValueError("rotation vectors must be of size 3")
+    theta = numpy.sqrt((v.array*v.array).sum(axis=-1))
+    k = numpy.sin(theta/2)/numpy.where(theta == 0, 1, theta)
+    k = numpy.where(theta == 0, 1/2, k)[..., None]
+    q = numpy.concatenate([numpy.cos(theta/2)[..., None], k*v.array], -1)
+    return type(v)(q)
+
+def magQuaMul(a, b):
+    """Return the Hamilton products of the quaternions 'a' and 'b'."""
+    checkType([a, b], (Vector, VectorArray))
+    if a.array.shape[-1] != 4 or b.array.shape[-1] != 4:
+        raise ValueError("quaternions must be of size 4")
+    w1, x1, y1, z1 = numpy.moveaxis(a.array, -1, 0)
+    w2, x2, y2, z2 = numpy.moveaxis(b.array, -1, 0)
+    q = numpy.stack([w1*w2-x1*x2-y1*y2-z1*z2,
+                     w1*x2+x1*w2+y1*z2-z1*y2,
+                     w1*y2-x1*z2+y1*w2+z1*x2,
+                     w1*z2+x1*y2-y1*x2+z1*w2], axis=-1)
+    return VectorArray(q) if isBatch(a, b) else Vector(q)
+
+def magQuaMat(q):
+    """Return the rotation matrices associated with the unit quaternions."""
+    checkType([q], (Vector, VectorArray))
+    if q.array.shape[-1] != 4:
+        raise ValueError("quaternions must be of size 4")
+    w, x, y, z = numpy.moveaxis(q.array, -1, 0)
+    r1 = numpy.stack([1-2*(y*y+z*z), 2*(x*y-w*z), 2*(x*z+w*y)], axis=-1)
+    r2 = numpy.stack([2*(x*y+w*z), 1-2*(x*x+z*z), 2*(y*z-w*x)], axis=-1)
+    r3 = numpy.stack([2*(x*z-w*y), 2*(y*z+w*x), 1-2*(x*x+y*y)], axis=-1)
+    m = numpy.stack([r1, r2, r3], axis=-2)
+    return MatrixArray(m) if isBatch(q) else Matrix(m)
+
+def magMatQua(m, tol=1e-9):
+    """Return the unit quaternion associated with the rotation matrix 'm'."""
+    checkType([m], Matrix)
+    checkSize([m], 3)
+    a = m.array
+    if (abs(a @ a.T - numpy.identity(3)).max() > tol
+            or numpy.linalg.det(a) < 0):
+        raise ValueError("the matrix is not a rotation")
+    i = int(numpy.argmax([a[0, 0]+a[1, 1]+a[2, 2], a[0, 0], a[1, 1],
+                          a[2, 2]]))
+    if i is 0:
+        w = math.sqrt(1+a[0, 0]+a[1, 1]+a[2, 2])/2
+        q = [w, (a[2, 1]-a[1, 2])/(4*w), (a[0, 2]-a[2, 0])/(4*w),
+             (a[1, 0]-a[0, 1])/(4*w)]
+    elif i is 1:
+        x = math.sqrt(1+a[0, 0]-a[1, 1]-a[2, 2])/2
+        q = [(a[2, 1]-a[1, 2])/(4*x), x, (a[0, 1]+a[1, 0])/(4*x),
+             (a[0, 2]+a[2, 0])/(4*x)]
+    elif i is 2:
+        y = math.sqrt(1-a[0, 0]+a[1, 1]-a[2, 2])/2
+        q = [(a[0, 2]-a[2, 0])/(4*y), (a[0, 1]+a[1, 0])/(4*y), y,
+             (a[1, 2]+a[2, 1])/(4*y)]
+    else:
+        z = math.sqrt(1-a[0, 0]-a[1, 1]+a[2, 2])/2
+        q = [(a[1, 0]-a[0, 1])/(4*z), (a[0, 2]+a[2, 0])/(4*z),
+             (a[1, 2]+a[2, 1])/(4*z), z]
+    return Vector(numpy.array(q))
 
 def magCom(i):
     """Return the 'i'th component of 'v'."""